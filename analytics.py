@@ -2,14 +2,16 @@
 
 import logging
 import gzip
+import io
+from typing import Iterable, Iterator
 
 import boto3
 
-from sheetsapi import dynamodb_client, config
+from sheetsapi import dynamodb_client, config, rollups
 
 logger = logging.getLogger(__name__)
 config.Config.init()
-db_client = dynamodb_client.DynamoDBClient()
+db_client = dynamodb_client.default_client()
 s3 = boto3.client("s3")
 
 
@@ -17,7 +19,12 @@ def handler(event, _context):
     """Extract CloudFront logs from S3 and write to DynamoDB
 
     Only processes API requests (calls to /api/* paths) since
-    these are the APIs we want analytics on.
+    these are the APIs we want analytics on. Logs are decompressed and
+    parsed as they are written, so memory use does not grow with their size.
+
+    Invocation counts per API, time bucket and status class are aggregated
+    for each log and then added to rollups, see `rollups`, once per log even
+    if the same notification is processed again.
     """
     for record in event["Records"]:
         bucket_name = record["s3"]["bucket"]["name"]
@@ -25,37 +32,54 @@ def handler(event, _context):
 
         try:
             response = s3.get_object(Bucket=bucket_name, Key=object_key)
+            counter = rollups.RollupCounter()
             with gzip.GzipFile(fileobj=response["Body"]) as gz:
-                object_content = gz.read().decode("utf-8")
+                lines = io.TextIOWrapper(gz, encoding="utf-8")
+                requests = counter.count(parse_api_requests(lines))
+                line_items = (
+                    {
+                        "path": path,  # Table primary key
+                        "timestamp": timestamp,  # Table range key
+                        "status_code": status_code,
+                    }
+                    for path, timestamp, status_code in requests
+                )
+                # Requests to a path in the same second share a key, and only
+                # one of them is kept, as when each line was put on its own
+                lines_processed = db_client.batch_put_items(
+                    config.Config.Constants.ANALYTICS_TABLE,
+                    line_items,
+                    overwrite_by_pkeys=["path", "timestamp"],
+                )
+            # S3 notifications are delivered at least once and failed
+            # invocations are retried, so each object is only counted into
+            # each rollup once
+            log_object = f"{bucket_name}/{object_key}"
+            db_client.add_to_items_once(
+                config.Config.Constants.ANALYTICS_TABLE,
+                (
+                    (
+                        {"path": path, "timestamp": bucket},
+                        amounts,
+                        rollups.ingestion_marker_key(log_object, path, bucket),
+                    )
+                    for (path, bucket), amounts in counter.increments().items()
+                ),
+            )
         except Exception as e:
             logger.error(
-                f"Error getting object {object_key} from bucket {bucket_name}. Error: {str(e)}"
+                f"Error processing object {object_key} from bucket {bucket_name}. Error: {str(e)}"
             )
             raise e
 
-        log_lines = parse_cloudfront_log_lines(object_content)
-        lines_processed = 0
-        for line in log_lines:
-            if "/api/" not in line["cs-uri-stem"]:
-                continue  # Only care about API requests, not user data
-
-            line["timestamp"] = f"{line['date']}T{line['time']}Z"
-            line_item = {
-                "path": line["cs-uri-stem"].split("/api/")[1],  # Table primary key
-                "timestamp": line["timestamp"],  # Table range key
-                "status_code": int(line["sc-status"]),
-            }
-            db_client.put_item(config.Config.Constants.ANALYTICS_TABLE, line_item)
-            lines_processed += 1
-
     return {
         "statusCode": 200,
         "body": {"message": f"Successfully processed {lines_processed} records"},
     }
 
 
-def parse_cloudfront_log_lines(content: str) -> list[dict]:
-    """Parse CloudFront log lines text into a list of dictionaries
+def parse_api_requests(lines: Iterable[str]) -> Iterator[tuple[str, str, int]]:
+    """Parse API requests out of CloudFront log lines, one line at a time.
 
     CloudFront log format is:
     ```txt
@@ -63,18 +87,30 @@ def parse_cloudfront_log_lines(content: str) -> list[dict]:
     #Fields: field1    field2    field3
     value1    value2    value3
     ```
+
+    Args:
+        lines: Lines of a log file, e.g. a text stream.
+
+    Yields:
+        The API path (after /api/), ISO timestamp and status code of each
+        request to an /api/* path.
     """
-    lines = content.strip().split("\n")
-
-    # Extract the version and fields information
-    fields_line = lines[1]
-    field_names = fields_line.split(": ")[1].split()
-
-    log_entries = []
-    for line in lines[2:]:
-        field_values = line.split("\t")
-        log_entry = {}
-        for name, value in zip(field_names, field_values):
-            log_entry[name] = value
-        log_entries.append(log_entry)
-    return log_entries
+    columns = None
+    for line in lines:
+        if line.startswith("#"):
+            if line.startswith("#Fields:"):
+                field_names = line.split(": ", 1)[1].split()
+                columns = [
+                    field_names.index(name)
+                    for name in ("cs-uri-stem", "date", "time", "sc-status")
+                ]
+            continue
+        # Cheap check before splitting, as most lines are not API requests
+        if columns is None or "/api/" not in line:
+            continue
+
+        field_values = line.rstrip("\n").split("\t")
+        uri_stem, date, time, status = (field_values[i] for i in columns)
+        if "/api/" not in uri_stem:
+            continue  # Only care about API requests, not user data
+        yield uri_stem.split("/api/")[1], f"{date}T{time}Z", int(status)
@@ -1,3 +1,6 @@
+import asyncio
+import dataclasses
+import datetime
 import logging
 import re
 
@@ -11,21 +14,25 @@ from sheetsapi import (
     sentry_helpers,
     stripe_helpers,
     cloudfront_helpers,
+    record_query,
+    response_helpers,
+    streaming,
+    exporters,
+    subscriptions,
 )
 
 import fastapi
 import gspread
 import mangum
 import stripe
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.requests import Request
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.responses import HTMLResponse, RedirectResponse
+from starlette.responses import HTMLResponse, RedirectResponse, Response
 from authlib.integrations.starlette_client import OAuth, OAuthError
 from fastapi.middleware.cors import CORSMiddleware
 
-
 logger = logging.getLogger(__name__)
 
 config.Config.init()
@@ -33,11 +40,19 @@ sentry_helpers.init()
 
 oauth = OAuth(config.Config.to_starlette_config())
 sheets_handler = google_sheets.GoogleSheets()
+subscription_hub = subscriptions.SubscriptionHub(sheets_handler)
 analytics_handler = analytics_client.AnalyticsClient()
 cloudfront = cloudfront_helpers.create_cloudfront_client()
 
 app = fastapi.FastAPI()
 
+
+@app.on_event("shutdown")
+async def close_clients():
+    await sheets_handler.values_client.aclose()
+    await asyncio.to_thread(sheets_handler.credential_pool.flush)
+
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=config.Config.Constants.OAUTH_SECRET_TOKEN,
@@ -55,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Sheet-Version"],
 )
 
 OAUTH_SCOPES = [
@@ -63,9 +79,21 @@ OAUTH_SCOPES = [
     "profile",
     "email",
 ]
+if config.Config.Constants.REQUEST_DRIVE_METADATA_SCOPE:
+    # Lets cached worksheets be revalidated by the spreadsheet's modifiedTime
+    OAUTH_SCOPES.append("https://www.googleapis.com/auth/drive.metadata.readonly")
 
 OATH_METADATA_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
+# Invocations returned per page by /get-api-invocations when paging
+DEFAULT_INVOCATIONS_PAGE_SIZE = 1000
+MAX_INVOCATIONS_PAGE_SIZE = 10000
+
+MULTI_WORKSHEET_QUERY_ERROR = (
+    "Filtering, sorting, field selection and pagination are only supported "
+    "when reading a single worksheet."
+)
+
 oauth.register(
     name="google",
     server_metadata_url=OATH_METADATA_URL,
@@ -159,27 +187,290 @@ def get_user_data(request: Request):
 
 
 @app.get("/api/{name}")
-def read_sheet(name: str, worksheet: str = "Sheet1"):
+async def read_sheet(
+    request: Request,
+    name: str,
+    worksheet: str = "Sheet1",
+    worksheets: str | None = None,
+    output_format: str | None = fastapi.Query(None, alias="format"),
+):
+    """Read a worksheet, or several at once.
+
+    Pass `worksheets=A,B,C` (or `worksheet=*` for every tab) to fetch multiple
+    worksheets in one upstream request. The response is then an object keyed
+    by worksheet name.
+
+    Single worksheet reads can be filtered, projected, sorted and paginated
+    with query parameters; see `record_query.RecordQuery.from_params`. They can
+    also be streamed as `format=ndjson` or `format=csv` (or via Accept), or
+    exported as `format=arrow` (Arrow IPC stream) or `format=parquet`.
+    Multi-worksheet reads are JSON only and reject those query parameters.
+    """
+    try:
+        query = record_query.RecordQuery.from_params(request.query_params.multi_items())
+    except record_query.InvalidQuery as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    output_format = streaming.negotiate_format(
+        output_format, request.headers.get("accept")
+    )
+    if output_format not in ("json", *streaming.MEDIA_TYPES, *exporters.MEDIA_TYPES):
+        raise fastapi.HTTPException(400, f"Unsupported format: {output_format}")
+
     try:
-        data = sheets_handler.get_sheet_data(name, worksheet)
-        if data.get("frozen"):
-            raise fastapi.HTTPException(
-                401, "API is frozen. Upgrade to premium to unfreeze"
+        if worksheets is not None or worksheet == "*":
+            _check_multi_worksheet_query(query, output_format)
+            names = None if worksheets is None else worksheets.split(",")
+            sheets = await sheets_handler.get_sheets_data_async(name, names)
+            if any(data.frozen for data in sheets.values()):
+                raise fastapi.HTTPException(
+                    401, "API is frozen. Upgrade to premium to unfreeze"
+                )
+            # Filters on columns of none of the worksheets are ignored, as for
+            # single worksheet reads
+            if any(
+                not query.for_table(data.table).is_empty() for data in sheets.values()
+            ):
+                raise fastapi.HTTPException(400, MULTI_WORKSHEET_QUERY_ERROR)
+            # Worksheets of one API share its cdn_ttl
+            first = next(iter(sheets.values()), None)
+            return JSONResponse(
+                content={title: data.records() for title, data in sheets.items()},
+                headers={"Cache-Control": first.cache_control()} if first else {},
+                status_code=200,
             )
 
-        return JSONResponse(
-            content=data["data"],
-            headers={"Cache-Control": f"max-age={data['cdn_ttl']}, public"},
-            status_code=200,
-        )
+        data = await sheets_handler.get_sheet_data_async(name, worksheet)
     except gspread.exceptions.WorksheetNotFound:
         raise fastapi.HTTPException(
             status_code=404,
-            detail=f"Worksheet {worksheet} not found. To specify a worksheet, use, e.g., ?worksheet=your_sheet_name.",
+            detail=f"Worksheet {worksheets or worksheet} not found. To specify a worksheet, use, e.g., ?worksheet=your_sheet_name.",
         )
     except google_sheets.SheetNotFound as e:
         raise fastapi.HTTPException(status_code=404, detail="Sheet API not found.")
 
+    if data.frozen:
+        raise fastapi.HTTPException(
+            401, "API is frozen. Upgrade to premium to unfreeze"
+        )
+    query = query.for_table(data.table)
+    return await _worksheet_response(request, name, data, query, output_format)
+
+
+def _check_multi_worksheet_query(
+    query: record_query.RecordQuery, output_format: str
+) -> None:
+    """Reject query options that multi-worksheet reads cannot honor.
+
+    Column filters are checked once the worksheets are loaded.
+    """
+    if output_format != "json":
+        raise fastapi.HTTPException(
+            400, "Only JSON is supported when reading several worksheets."
+        )
+    if not dataclasses.replace(query, filters=[]).is_empty():
+        raise fastapi.HTTPException(400, MULTI_WORKSHEET_QUERY_ERROR)
+
+
+async def _worksheet_response(
+    request: Request,
+    name: str,
+    data: google_sheets.SheetData,
+    query: record_query.RecordQuery,
+    output_format: str,
+):
+    """Build the response for a single worksheet read."""
+    headers = {
+        "Cache-Control": data.cache_control(),
+        # Lets clients poll /api/{name}/changes for what changed since
+        "X-Sheet-Version": str(data.version),
+    }
+    if output_format == "json" and query.is_empty():
+        return response_helpers.cached_response(
+            request,
+            etag=data.etag,
+            body_for_encoding=data.encoded_body,
+            media_type="application/json",
+            headers=headers,
+        )
+
+    if output_format in exporters.MEDIA_TYPES:
+        return await _export_response(request, name, data, query, output_format)
+
+    selection = query.select(data.table, data.indexes)
+    headers["X-Total-Count"] = str(selection.total)
+    if selection.next_cursor is not None:
+        headers["X-Next-Cursor"] = selection.next_cursor
+
+    if output_format == "ndjson":
+        stream = streaming.ndjson_stream(data.table, selection.positions, query.fields)
+    elif output_format == "csv":
+        stream = streaming.csv_stream(data.table, selection.positions, query.fields)
+    else:
+        records = list(data.table.rows(selection.positions, query.fields))
+        return JSONResponse(content=records, headers=headers, status_code=200)
+    return StreamingResponse(
+        stream, media_type=streaming.MEDIA_TYPES[output_format], headers=headers
+    )
+
+
+async def _export_response(
+    request: Request,
+    name: str,
+    data: google_sheets.SheetData,
+    query: record_query.RecordQuery,
+    export_format: str,
+):
+    """Build the response for a worksheet read in a binary export format."""
+    headers = {"Cache-Control": data.cache_control()}
+    media_type = exporters.MEDIA_TYPES[export_format]
+    try:
+        if query.is_empty():
+            etag = f"{data.etag}-{export_format}"
+            body = b""
+            if not response_helpers.etag_matches(
+                request.headers.get("if-none-match"), etag
+            ):
+                # Whole-sheet exports are cached with the sheet data
+                body = await sheets_handler.export_async(name, data, export_format)
+            return response_helpers.cached_response(
+                request,
+                etag=etag,
+                body_for_encoding=lambda _: body,
+                media_type=media_type,
+                headers=headers,
+                compressible=False,
+            )
+
+        selection = query.select(data.table, data.indexes)
+        body = await asyncio.to_thread(
+            exporters.export,
+            data.table,
+            export_format,
+            selection.positions,
+            query.fields,
+        )
+    except exporters.ExportUnavailable as e:
+        raise fastapi.HTTPException(status_code=501, detail=str(e))
+
+    headers["X-Total-Count"] = str(selection.total)
+    if selection.next_cursor is not None:
+        headers["X-Next-Cursor"] = selection.next_cursor
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def _get_servable_sheet_data(
+    name: str, worksheet: str
+) -> google_sheets.SheetData:
+    """Get a worksheet's data, raising HTTP errors if it cannot be served."""
+    try:
+        data = await sheets_handler.get_sheet_data_async(name, worksheet)
+    except gspread.exceptions.WorksheetNotFound:
+        raise fastapi.HTTPException(
+            status_code=404, detail=f"Worksheet {worksheet} not found."
+        )
+    except google_sheets.SheetNotFound:
+        raise fastapi.HTTPException(status_code=404, detail="Sheet API not found.")
+
+    if data.frozen:
+        raise fastapi.HTTPException(
+            401, "API is frozen. Upgrade to premium to unfreeze"
+        )
+    return data
+
+
+@app.get("/api/{name}/rows/{key}")
+async def read_sheet_row(
+    name: str, key: str, worksheet: str = "Sheet1", column: str | None = None
+):
+    """Read a single row by the value of an index column."""
+    data = await _get_servable_sheet_data(name, worksheet)
+    try:
+        row = data.get_row(key, column)
+    except KeyError:
+        raise fastapi.HTTPException(
+            status_code=400,
+            detail="No index column configured. Set one with /update-api-index-columns.",
+        )
+    if row is None:
+        raise fastapi.HTTPException(status_code=404, detail=f"Row {key} not found.")
+    return JSONResponse(
+        content=row, headers={"Cache-Control": data.cache_control()}, status_code=200
+    )
+
+
+@app.get("/api/{name}/changes")
+async def read_sheet_changes(name: str, since: int, worksheet: str = "Sheet1"):
+    """Read the rows added, changed and removed since a version of a worksheet.
+
+    Versions are returned in the X-Sheet-Version header of `/api/{name}` and
+    as `version` here. If the changes since `since` are no longer known, the
+    response has `reset: true` and contains every row instead.
+    """
+    data = await _get_servable_sheet_data(name, worksheet)
+    changes = data.changes_since(since)
+    if changes is None:
+        content = {"version": data.version, "reset": True, "rows": data.records()}
+    else:
+        content = changes.to_dict()
+    return JSONResponse(
+        content=content,
+        headers={"Cache-Control": data.cache_control()},
+        status_code=200,
+    )
+
+
+@app.get("/api/{name}/subscribe")
+async def subscribe_sheet(
+    request: Request, name: str, worksheet: str = "Sheet1", since: int | None = None
+):
+    """Subscribe to updates of a worksheet as Server-Sent Events.
+
+    See `subscriptions.SubscriptionHub.stream` for the events sent. Browsers
+    reconnecting with Last-Event-ID only receive what they missed.
+
+    Only available where `SUBSCRIPTIONS_ENABLED` is set, i.e. on ECS.
+    """
+    if not config.Config.Constants.SUBSCRIPTIONS_ENABLED:
+        raise fastapi.HTTPException(
+            501, "Subscriptions are not available on this deployment."
+        )
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+    data = await _get_servable_sheet_data(name, worksheet)
+    return StreamingResponse(
+        subscription_hub.stream(name, worksheet, data, since),
+        media_type="text/event-stream",
+        # Events must reach clients as they happen, not from a cache or buffer
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/{name}/schema")
+async def read_sheet_schema(name: str, worksheet: str = "Sheet1"):
+    """Read the inferred type of each column of a worksheet."""
+    data = await _get_servable_sheet_data(name, worksheet)
+    return JSONResponse(
+        content=[dataclasses.asdict(column) for column in data.column_schema],
+        headers={"Cache-Control": data.cache_control()},
+        status_code=200,
+    )
+
+
+@app.get("/cache-stats")
+def get_cache_stats(request: Request):
+    if not config.Config.Constants.CACHE_STATS_ENABLED:
+        raise fastapi.HTTPException(status_code=404, detail="Not Found")
+    if request.session.get("user") is None:
+        raise fastapi.HTTPException(status_code=401, detail="Not authenticated")
+
+    shared_cache = sheets_handler.shared_worksheet_cache
+    return {
+        **sheets_handler.hot_worksheet_cache.snapshot_stats(),
+        "shared": shared_cache.snapshot_stats() if shared_cache else None,
+        "items": sheets_handler.repository.item_cache.snapshot_stats(),
+    }
+
 
 @app.get("/get-user-sheets")
 def get_user_sheets(request: Request):
@@ -245,7 +536,7 @@ def delete_api(request: Request, name: str):
     if user is None:
         raise fastapi.HTTPException(status_code=401, detail="Not authenticated")
 
-    repo = dynamodb_client.DynamoDBClient()
+    repo = dynamodb_client.default_client()
     user_email = user.get("email")
     key = {"id": f"sheet-{name}"}
     api = repo.get_item(config.Config.Constants.SHEETS_API_TABLE, key=key)
@@ -258,7 +549,14 @@ def delete_api(request: Request, name: str):
         raise fastapi.HTTPException(
             401, f"User with email {user_email} not authorized to delete api {name}"
         )
+    try:
+        worksheets = sheets_handler.get_sheet_worksheets(name)
+    except Exception:
+        # Still evict the default worksheet and those known from the cache
+        logger.exception(f"Failed to list the worksheets of {name}")
+        worksheets = ["Sheet1"]
     repo.delete_item(config.Config.Constants.SHEETS_API_TABLE, key=key)
+    sheets_handler.evict(name, worksheets)
     repo.increment_item_field(
         config.Config.Constants.SHEETS_API_TABLE,
         key={"id": f"user-{user_email}"},
@@ -276,6 +574,25 @@ def delete_api(request: Request, name: str):
         )
 
 
+@app.post("/update-api-index-columns/{name}")
+def update_api_index_columns(
+    request: Request, name: str, index_columns: str = fastapi.Form("")
+):
+    user: dict | None = request.session.get("user")
+    if user is None:
+        raise fastapi.HTTPException(status_code=401, detail="Not authenticated")
+
+    api = sheets_handler.repository.get_item(
+        config.Config.Constants.SHEETS_API_TABLE, key={"id": f"sheet-{name}"}
+    )
+    if api is None or api["email"] != user.get("email"):
+        raise fastapi.HTTPException(status_code=404, detail="Sheet API not found.")
+
+    columns = [column for column in index_columns.split(",") if column]
+    sheets_handler.set_index_columns(name, columns)
+    return {"index_columns": columns}
+
+
 @app.get("/get-api-info")
 def get_api_info(request: Request, name: str = fastapi.Query(...)):
     user: dict | None = request.session.get("user")
@@ -294,18 +611,36 @@ def get_api_info(request: Request, name: str = fastapi.Query(...)):
         "worksheets": worksheets,
         "spreadsheet_name": api["spreadsheet_name"],
         "cdn_ttl": api["cdn_ttl"],
+        "index_columns": api.get("index_columns", []),
     }
 
 
 @app.get("/get-api-invocations")
-def get_sheet_invocations(api_name: str, start_time: str):
+def get_sheet_invocations(
+    response: Response,
+    api_name: str,
+    start_time: str,
+    limit: int | None = fastapi.Query(None, ge=1, le=MAX_INVOCATIONS_PAGE_SIZE),
+    cursor: str | None = None,
+):
     date_regex = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}"
     if not re.match(date_regex, start_time):
         raise fastapi.HTTPException(
             status_code=400, detail="Invalid start time format. Use ISO 8601 format."
         )
 
-    return analytics_handler.get_api_logs(api_name, start_time)
+    # Without limit or cursor, keep returning every invocation for existing clients
+    if limit is None and cursor is None:
+        return analytics_handler.get_api_logs(api_name, start_time)
+    try:
+        logs, next_cursor = analytics_handler.get_api_logs_page(
+            api_name, start_time, limit or DEFAULT_INVOCATIONS_PAGE_SIZE, cursor
+        )
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
 
 
 @app.get("/get-api-invocations-total")
@@ -313,6 +648,40 @@ def get_sheet_invocations_total(api_name: str):
     return analytics_handler.get_api_total_invocations(api_name)
 
 
+@app.get("/get-api-invocations-series")
+def get_sheet_invocations_series(
+    api_name: str,
+    start_time: str,
+    end_time: str | None = None,
+    granularity: str = "hour",
+):
+    try:
+        start = _to_naive_utc(datetime.datetime.fromisoformat(start_time))
+        end = (
+            _to_naive_utc(datetime.datetime.fromisoformat(end_time))
+            if end_time
+            else datetime.datetime.utcnow()
+        )
+    except ValueError:
+        raise fastapi.HTTPException(
+            status_code=400, detail="Invalid time format. Use ISO 8601 format."
+        )
+
+    try:
+        return analytics_handler.get_api_invocation_series(
+            api_name, granularity, start, end
+        )
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+
+
+def _to_naive_utc(time: datetime.datetime) -> datetime.datetime:
+    # Log timestamps are UTC; times without an offset are taken to be UTC too
+    if time.tzinfo is None:
+        return time
+    return time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
 @app.post("/stripe-webhook")
 async def webhook_received(
     request: Request, stripe_signature: str = fastapi.Header(None)
@@ -339,4 +708,6 @@ async def webhook_received(
 # This handler exports the FastAPI app to a Lambda handler
 # allowing it to be run as a serverless function. If run via
 # ECS, we can use `fastapi dev ...` instead.
-handler = mangum.Mangum(app)
+# Lifespan events would run around every invocation, closing the pooled
+# clients and flushing credentials each time, so they only run on ECS.
+handler = mangum.Mangum(app, lifespan="off")
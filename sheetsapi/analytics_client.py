@@ -1,36 +1,179 @@
-from sheetsapi import dynamodb_client, config
+import datetime
+from typing import Optional
+
+from sheetsapi import dynamodb_client, config, rollups
+
+# Most buckets returned by one time series request
+MAX_SERIES_BUCKETS = 1440
 
 
 class AnalyticsClient:
     repository: dynamodb_client.DynamoDBClient
 
     def __init__(self, repository: dynamodb_client.DynamoDBClient = None):
-        self.repository = repository or dynamodb_client.DynamoDBClient()
+        self.repository = repository or dynamodb_client.default_client()
 
     def get_api_logs(self, path: str, start_time: str) -> list[dict]:
-        """Get the total number of invocations for an API path."""
+        """Get the invocations of an API path since a time."""
+        return self.repository._generic_query(
+            config.Config.Constants.ANALYTICS_TABLE, _logs_query(path, start_time)
+        )
+
+    def get_api_logs_page(
+        self, path: str, start_time: str, limit: int, cursor: Optional[str] = None
+    ) -> tuple[list[dict], Optional[str]]:
+        """Get a page of the invocations of an API path since a time.
+
+        Args:
+            path: The API path.
+            start_time: ISO timestamp to get invocations after.
+            limit: Maximum number of invocations to return.
+            cursor: Cursor returned with the previous page, if any.
+
+        Returns:
+            The invocations, oldest first, and a cursor for the next page, or
+            None if this is the last page.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        return self.repository.query_page(
+            config.Config.Constants.ANALYTICS_TABLE,
+            _logs_query(path, start_time),
+            limit,
+            cursor,
+        )
+
+    def get_api_total_invocations(self, path: str) -> int:
+        """Get the total number of invocations for an API path.
+
+        Rollups only count invocations ingested since they were introduced.
+        The first time an API's total is read, its earlier invocations are
+        counted from the logs and added to its total rollup.
+        """
+        table = config.Config.Constants.ANALYTICS_TABLE
+        key = {
+            "path": rollups.partition_key(path, rollups.TOTAL),
+            "timestamp": rollups.TOTAL_BUCKET,
+        }
+        rollup = self.repository.get_item(table, key)
+        if rollup is not None and rollups.BACKFILLED in rollup:
+            return int(rollup[rollups.TOTAL_COUNT])
+
+        first_minutes, _ = self.repository.query_page(
+            table, _rollups_query(path, "minute"), limit=1
+        )
+        if not first_minutes:
+            # Nothing was ingested since rollups were introduced
+            return self.repository.count(table, _logs_query(path, ""))
+
+        # Invocations logged before the first rollup bucket predate rollups
+        earlier = self.repository.count(
+            table, _logs_before_query(path, first_minutes[0]["timestamp"])
+        )
+        self.repository.add_to_item_once(
+            table, key, {rollups.TOTAL_COUNT: earlier}, rollups.BACKFILLED
+        )
+        rollup = self.repository.get_item(table, key)
+        return int(rollup[rollups.TOTAL_COUNT])
+
+    def get_api_invocation_series(
+        self,
+        path: str,
+        granularity: str,
+        start: datetime.datetime,
+        end: datetime.datetime,
+    ) -> list[dict]:
+        """Get the number of invocations of an API path over time.
+
+        Args:
+            path: The API path.
+            granularity: Bucket size, one of `rollups.GRANULARITIES`.
+            start: Time of the first bucket.
+            end: Time of the last bucket.
+
+        Returns:
+            The buckets with invocations, oldest first, with the count of each
+            status class and in total.
+
+        Raises:
+            ValueError: If the granularity is unknown, `end` is before `start`
+                or the range spans more than `MAX_SERIES_BUCKETS` buckets.
+        """
+        if end < start:
+            raise ValueError("The end time must not be before the start time.")
+        if granularity not in rollups.GRANULARITIES:
+            raise ValueError(
+                f"Unknown granularity {granularity}. "
+                f"Use one of: {', '.join(rollups.GRANULARITIES)}."
+            )
+        if rollups.bucket_count(start, end, granularity) > MAX_SERIES_BUCKETS:
+            raise ValueError(
+                f"Time range too large. At most {MAX_SERIES_BUCKETS} buckets "
+                "can be requested at once."
+            )
+
         result = self.repository._generic_query(
             config.Config.Constants.ANALYTICS_TABLE,
             {
-                "KeyConditionExpression": "#path = :path_value AND #timestamp > :timestamp_value",
+                "KeyConditionExpression": "#path = :path_value AND #timestamp BETWEEN :start AND :end",
                 "ExpressionAttributeNames": {
                     "#path": "path",
                     "#timestamp": "timestamp",
                 },
                 "ExpressionAttributeValues": {
-                    ":path_value": path,
-                    ":timestamp_value": start_time,
+                    ":path_value": rollups.partition_key(path, granularity),
+                    ":start": rollups.bucket(start.isoformat(), granularity),
+                    ":end": rollups.bucket(end.isoformat(), granularity),
                 },
             },
         )
-        return result
+        return [
+            {
+                "timestamp": item["timestamp"],
+                **{
+                    field: int(value)
+                    for field, value in item.items()
+                    if field not in ("path", "timestamp")
+                },
+            }
+            for item in result
+        ]
 
-    def get_api_total_invocations(self, path: str) -> int:
-        """Get the total number of invocations for an API path."""
-        result = self.repository.query_index(
-            config.Config.Constants.ANALYTICS_TABLE,
-            None,  # No index, TODO: make this function's API better (e.g. pass dict of params)
-            "path",
-            path,
-        )
-        return len(result)
+
+def _logs_query(path: str, start_time: str) -> dict:
+    return {
+        "KeyConditionExpression": "#path = :path_value AND #timestamp > :timestamp_value",
+        "ExpressionAttributeNames": {
+            "#path": "path",
+            "#timestamp": "timestamp",
+        },
+        "ExpressionAttributeValues": {
+            ":path_value": path,
+            ":timestamp_value": start_time,
+        },
+    }
+
+
+def _logs_before_query(path: str, end_time: str) -> dict:
+    return {
+        "KeyConditionExpression": "#path = :path_value AND #timestamp < :timestamp_value",
+        "ExpressionAttributeNames": {
+            "#path": "path",
+            "#timestamp": "timestamp",
+        },
+        "ExpressionAttributeValues": {
+            ":path_value": path,
+            ":timestamp_value": end_time,
+        },
+    }
+
+
+def _rollups_query(path: str, granularity: str) -> dict:
+    return {
+        "KeyConditionExpression": "#path = :path_value",
+        "ExpressionAttributeNames": {"#path": "path"},
+        "ExpressionAttributeValues": {
+            ":path_value": rollups.partition_key(path, granularity)
+        },
+    }
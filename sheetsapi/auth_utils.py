@@ -1,6 +1,10 @@
+import collections
 import dataclasses
 import logging
+import threading
+import time
 import gspread
+from sheetsapi import dynamodb_client
 from sheetsapi.config import Config
 from google.oauth2.credentials import Credentials
 
@@ -45,17 +49,166 @@ class GoogleOauthFields:
             client_secret=Config.Constants.GOOGLE_CLIENT_SECRET,
         )
 
-    def init_gspread_client(self) -> gspread.Client:
-        """Initialize a gspread client with the oauth fields.
+    def init_credentials(self) -> Credentials:
+        """Initialize Google credentials with the oauth fields.
 
         Returns:
-            gspread.Client: The gspread client.
+            Credentials: The Google credentials.
         """
-        creds = Credentials(
+        return Credentials(
             token=self.access_token,
             refresh_token=self.refresh_token,
             token_uri=self.token_uri,
             client_id=self.client_id,
             client_secret=self.client_secret,
         )
-        return gspread.authorize(creds)
+
+    def init_gspread_client(self) -> gspread.Client:
+        """Initialize a gspread client with the oauth fields.
+
+        Returns:
+            gspread.Client: The gspread client.
+        """
+        return gspread.authorize(self.init_credentials())
+
+
+@dataclasses.dataclass
+class _PooledCredentials:
+    fields: GoogleOauthFields
+    credentials: Credentials
+    client: gspread.Client | None = None
+    owner_keys: set = dataclasses.field(default_factory=set)
+    persisted_token: str | None = None
+
+
+@dataclasses.dataclass
+class CredentialPool:
+    """Process-wide pool of Google credentials and gspread clients.
+
+    Credentials are keyed by refresh token, so access tokens refreshed by one
+    request are reused by the next until they expire, and each gspread client
+    keeps its keep-alive HTTP session. Refreshed access tokens are written back
+    to the repository items that own them in periodic batches.
+
+    Args:
+        repository: Repository to write refreshed tokens back to.
+        max_entries: Maximum number of credentials to keep.
+        flush_interval: Seconds between write-backs of refreshed tokens.
+    """
+
+    repository: dynamodb_client.DynamoDBClient
+    max_entries: int = 256
+    flush_interval: float = 60.0
+    _entries: collections.OrderedDict = dataclasses.field(
+        default_factory=collections.OrderedDict
+    )
+    _evicted: list = dataclasses.field(default_factory=list)
+    _last_flush: float = dataclasses.field(default_factory=time.time)
+    _lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False
+    )
+
+    def credentials(
+        self, auth_creds: GoogleOauthFields, owner_key: str | None = None
+    ) -> Credentials:
+        """Get pooled credentials for the given oauth fields.
+
+        Args:
+            auth_creds: Oauth fields, e.g. as stored on an API item.
+            owner_key: Repository key of the item storing these credentials,
+                to write refreshed tokens back to.
+
+        Returns:
+            Shared credentials for the refresh token.
+        """
+        return self._entry(auth_creds, owner_key).credentials
+
+    def gspread_client(
+        self, auth_creds: GoogleOauthFields, owner_key: str | None = None
+    ) -> gspread.Client:
+        """Get a pooled gspread client for the given oauth fields.
+
+        Args:
+            auth_creds: Oauth fields, e.g. as stored on an API item.
+            owner_key: Repository key of the item storing these credentials,
+                to write refreshed tokens back to.
+
+        Returns:
+            Shared gspread client for the refresh token.
+        """
+        with self._lock:
+            entry = self._entry(auth_creds, owner_key)
+            if entry.client is None:
+                entry.client = gspread.authorize(entry.credentials)
+            return entry.client
+
+    def current_fields(self, auth_creds: GoogleOauthFields) -> GoogleOauthFields:
+        """Get oauth fields with the latest access token known to the pool."""
+        with self._lock:
+            entry = self._entries.get(auth_creds.refresh_token)
+            if entry is None or entry.credentials.token is None:
+                return auth_creds
+            return dataclasses.replace(auth_creds, access_token=entry.credentials.token)
+
+    def flush_due(self) -> bool:
+        """Whether refreshed tokens should be written back now."""
+        return time.time() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> None:
+        """Write refreshed access tokens back to the items that own them.
+
+        Dirty entries are collected under the lock but written outside it,
+        so requests needing credentials never wait on DynamoDB. This does
+        blocking I/O, so call it from a worker thread.
+        """
+        with self._lock:
+            self._last_flush = time.time()
+            dirty = [
+                entry
+                for entry in self._evicted + list(self._entries.values())
+                if entry.credentials.token != entry.persisted_token
+            ]
+            self._evicted = []
+            writes = [
+                (entry, entry.credentials.token, set(entry.owner_keys))
+                for entry in dirty
+            ]
+        for entry, token, owner_keys in writes:
+            self._persist(entry, token, owner_keys)
+
+    def _entry(
+        self, auth_creds: GoogleOauthFields, owner_key: str | None
+    ) -> _PooledCredentials:
+        with self._lock:
+            entry = self._entries.get(auth_creds.refresh_token)
+            if entry is None:
+                entry = _PooledCredentials(
+                    fields=auth_creds,
+                    credentials=auth_creds.init_credentials(),
+                    persisted_token=auth_creds.access_token,
+                )
+                self._entries[auth_creds.refresh_token] = entry
+                while len(self._entries) > self.max_entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    # Written back by the next flush, never on the request path
+                    if evicted.credentials.token != evicted.persisted_token:
+                        self._evicted.append(evicted)
+            else:
+                self._entries.move_to_end(auth_creds.refresh_token)
+            if owner_key is not None:
+                entry.owner_keys.add(owner_key)
+            return entry
+
+    def _persist(self, entry: _PooledCredentials, token: str, owner_keys: set) -> None:
+        fields = dataclasses.replace(entry.fields, access_token=token)
+        for key in owner_keys:
+            try:
+                self.repository.update_item(
+                    Config.Constants.SHEETS_API_TABLE,
+                    key={"id": key},
+                    item={"auth_creds": dataclasses.asdict(fields)},
+                )
+            except ValueError:
+                logger.info(f"Item {key} no longer exists, skipping token write")
+        with self._lock:
+            entry.persisted_token = token
@@ -0,0 +1,149 @@
+import bisect
+import dataclasses
+from typing import Any, Optional, Sequence
+
+from sheetsapi import columnar, record_query
+
+# Bounds of each value kind in `record_query.sort_key` order
+_RANK_BOUNDS = {0: ((0,), (1,)), 1: ((1,), (2,))}
+
+
+def normalize_key(value: Any) -> str:
+    """Normalize a cell or query string value for hash lookups.
+
+    Numbers and numeric strings map to the same key, so `?id=123` finds a
+    cell holding the number 123. Likewise `?active=true` finds a cell holding
+    the boolean True. Query values matching booleans in other ways, like
+    `?active=1`, are handled by `ColumnIndex.lookup`.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower()
+    if isinstance(value, (int, float)):
+        return _format_number(value)
+    try:
+        return _format_number(float(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+@dataclasses.dataclass
+class ColumnIndex:
+    """Hash and sorted indexes over one column of worksheet records.
+
+    Args:
+        column: Column (header) name.
+        hash_index: Row positions by normalized value, for equality lookups.
+        sorted_keys: Sort keys of every row's value, in ascending order.
+        sorted_positions: Row positions matching `sorted_keys`.
+        has_bools: Whether any cell in the column is a boolean.
+    """
+
+    column: str
+    hash_index: dict[str, list[int]]
+    sorted_keys: list[tuple]
+    sorted_positions: list[int]
+    has_bools: bool = False
+
+    @classmethod
+    def build(cls, column: str, values: Sequence) -> "ColumnIndex":
+        """Build indexes for a column.
+
+        Args:
+            column: Column (header) name.
+            values: The column's values, one per row.
+
+        Returns:
+            The column index.
+        """
+        hash_index: dict[str, list[int]] = {}
+        has_bools = False
+        for position, value in enumerate(values):
+            hash_index.setdefault(normalize_key(value), []).append(position)
+            has_bools = has_bools or type(value) is bool
+        keyed = sorted(
+            (record_query.sort_key(value), position)
+            for position, value in enumerate(values)
+        )
+        return cls(
+            column=column,
+            hash_index=hash_index,
+            sorted_keys=[key for key, _ in keyed],
+            sorted_positions=[position for _, position in keyed],
+            has_bools=has_bools,
+        )
+
+    def lookup(self, value: Any) -> list[int]:
+        """Row positions where the column equals `value`.
+
+        Boolean cells are compared to `value` converted with
+        `record_query.coerce`, like filters do, so `?active=1` finds the same
+        rows with or without an index.
+        """
+        positions = self.hash_index.get(normalize_key(value), [])
+        if self.has_bools and isinstance(value, str):
+            as_bool = normalize_key(record_query.coerce(value, True))
+            if as_bool != normalize_key(value):
+                positions = sorted(positions + self.hash_index.get(as_bool, []))
+        return positions
+
+    def range(self, op: str, value: str) -> list[int]:
+        """Row positions where the column compares to `value` with `op`.
+
+        Numeric query values match numeric cells and other values match text
+        cells, like the comparisons in `record_query.Filter`.
+
+        Args:
+            op: One of gt, gte, lt, lte.
+            value: Raw value from the query string.
+
+        Returns:
+            Matching row positions, in ascending order of the column value.
+        """
+        target = record_query.range_target_key(value)
+        if target[0] not in _RANK_BOUNDS:
+            return []
+        rank_low, rank_high = _RANK_BOUNDS[target[0]]
+
+        lo = bisect.bisect_left(self.sorted_keys, rank_low)
+        hi = bisect.bisect_left(self.sorted_keys, rank_high)
+        if op == "gt":
+            lo = bisect.bisect_right(self.sorted_keys, target, lo, hi)
+        elif op == "gte":
+            lo = bisect.bisect_left(self.sorted_keys, target, lo, hi)
+        elif op == "lt":
+            hi = bisect.bisect_left(self.sorted_keys, target, lo, hi)
+        elif op == "lte":
+            hi = bisect.bisect_right(self.sorted_keys, target, lo, hi)
+        return self.sorted_positions[lo:hi]
+
+    def candidates(self, condition: record_query.Filter) -> Optional[set[int]]:
+        """Row positions that may satisfy a filter on this column.
+
+        Returns:
+            Matching positions, or None if the filter cannot use the index.
+        """
+        if condition.op == "eq":
+            return set(self.lookup(condition.value))
+        if condition.op == "in":
+            return {p for value in condition.value for p in self.lookup(value)}
+        if condition.op in ("gt", "gte", "lt", "lte"):
+            return set(self.range(condition.op, condition.value))
+        return None
+
+
+def build_indexes(
+    columns: list[str], table: columnar.ColumnarTable
+) -> dict[str, ColumnIndex]:
+    """Build indexes for the given columns that exist in the table."""
+    return {
+        column: ColumnIndex.build(column, table.column(column))
+        for column in columns
+        if table.has_column(column)
+    }
+
+
+def _format_number(number: float) -> str:
+    number = float(number)
+    return str(int(number)) if number.is_integer() else repr(number)
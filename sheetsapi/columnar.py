@@ -0,0 +1,178 @@
+import array
+import dataclasses
+import sys
+from typing import Iterable, Iterator, Optional, Sequence
+
+import gspread
+
+
+@dataclasses.dataclass
+class ColumnarTable:
+    """Worksheet rows stored column by column.
+
+    Headers are stored once rather than repeated as keys of every row.
+    Integer and float columns are packed into typed arrays and strings are
+    interned, so repeated values share memory. Rows are only materialized
+    as dicts when requested.
+
+    Args:
+        headers: Column names, in worksheet order.
+        columns: One sequence of cell values per header.
+        column_types: Type of each column, see `sheetsapi.schema`. Empty if
+            the types have not been inferred yet.
+    """
+
+    headers: tuple[str, ...]
+    columns: list[Sequence]
+    column_types: tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # Later duplicate headers win, like dict(zip(headers, row)) would
+        self._positions = {header: i for i, header in enumerate(self.headers)}
+
+    @classmethod
+    def from_values(cls, values: list[list]) -> "ColumnarTable":
+        """Build a table from worksheet values, like gspread's `get_all_records`.
+
+        The first row is used as the header. Rows are padded to the header width
+        and numeric-looking strings are converted to numbers.
+
+        Args:
+            values: Rows of cell values, as returned by the values API.
+
+        Returns:
+            The table.
+        """
+        if not values:
+            return cls(headers=(), columns=[])
+
+        headers = tuple(values[0])
+        width = max(len(row) for row in values)
+        cells: list[list] = [[] for _ in headers]
+        for row in values[1:]:
+            padded = gspread.utils.numericise_all(row + [""] * (width - len(row)))
+            for column, value in zip(cells, padded):
+                column.append(value)
+        return cls(headers=headers, columns=[compact_column(c) for c in cells])
+
+    @classmethod
+    def from_records(
+        cls, headers: tuple[str, ...], records: list[dict], column_types: tuple = ()
+    ) -> "ColumnarTable":
+        """Rebuild a table from the records returned by `to_records`.
+
+        Columns sharing a header get the values of the last of them, as that
+        is the one kept in records.
+
+        Args:
+            headers: Column names, in worksheet order.
+            records: Rows as dicts keyed by header.
+            column_types: Type of each column, see `sheetsapi.schema`.
+
+        Returns:
+            The table.
+        """
+        columns = [compact_column([r[h] for r in records]) for h in headers]
+        return cls(headers=headers, columns=columns, column_types=column_types)
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def has_column(self, name: str) -> bool:
+        return name in self._positions
+
+    def column(self, name: str) -> Sequence:
+        """Get all values of a column.
+
+        Args:
+            name: Column (header) name.
+
+        Returns:
+            The column's values, one per row.
+        """
+        return self.columns[self._positions[name]]
+
+    def column_type(self, name: str) -> Optional[str]:
+        """Get the inferred type of a column, or None if types are not known."""
+        if not self.column_types:
+            return None
+        return self.column_types[self._positions[name]]
+
+    def row(self, position: int, fields: Optional[Iterable[str]] = None) -> dict:
+        """Materialize a single row.
+
+        Args:
+            position: Zero-based row position, excluding the header.
+            fields: Columns to include. None includes all.
+
+        Returns:
+            The row as a dict keyed by header.
+        """
+        if fields is None:
+            return {h: c[position] for h, c in zip(self.headers, self.columns)}
+        return {
+            field: self.columns[self._positions[field]][position]
+            for field in fields
+            if field in self._positions
+        }
+
+    def rows(
+        self,
+        positions: Optional[Iterable[int]] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Iterator[dict]:
+        """Lazily materialize rows.
+
+        Args:
+            positions: Row positions to include, in output order. None
+                includes all rows.
+            fields: Columns to include. None includes all.
+
+        Yields:
+            Rows as dicts keyed by header.
+        """
+        if positions is None:
+            positions = range(len(self))
+        fields = list(fields) if fields is not None else None
+        for position in positions:
+            yield self.row(position, fields)
+
+    def tuples(
+        self,
+        positions: Optional[Iterable[int]] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Iterator[tuple]:
+        """Lazily yield rows as tuples of values, without building dicts.
+
+        Args:
+            positions: Row positions to include, in output order. None
+                includes all rows.
+            fields: Columns to include, in output order. None includes all.
+
+        Yields:
+            One tuple of values per row.
+        """
+        if positions is None:
+            positions = range(len(self))
+        if fields is None:
+            columns = self.columns
+        else:
+            columns = [self.column(f) for f in fields if f in self._positions]
+        for position in positions:
+            yield tuple(column[position] for column in columns)
+
+    def to_records(self) -> list[dict]:
+        """Materialize every row."""
+        return list(self.rows())
+
+
+def compact_column(values: list) -> Sequence:
+    """Store a column in the most compact form that preserves its values."""
+    if values and all(type(v) is int for v in values):
+        try:
+            return array.array("q", values)
+        except OverflowError:
+            pass
+    elif values and all(type(v) is float for v in values):
+        return array.array("d", values)
+    return [sys.intern(v) if type(v) is str else v for v in values]
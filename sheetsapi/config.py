@@ -41,6 +41,44 @@ class EnvConstants(pydantic_settings.BaseSettings):
 
     CLOUDFRONT_DISTRIBUTION_ID: str
 
+    HOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    STALE_WHILE_REVALIDATE_SECONDS: int = 60
+
+    STALE_IF_ERROR_SECONDS: int = 600
+
+    CHANGE_HISTORY_LENGTH: int = 32
+
+    # Bounds how long writes from other processes (e.g. freezing an API) take
+    # to be seen by cached API and user items
+    ITEM_CACHE_TTL_SECONDS: int = 30
+
+    ITEM_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+
+    DYNAMODB_MAX_POOL_CONNECTIONS: int = 50
+
+    # Shared cache tier behind the in-memory cache: "memory" (none), "disk"
+    # (shared by processes on a host) or "redis" (shared by every host)
+    CACHE_BACKEND: str = "disk"
+
+    # Empty to disable the disk cache tier
+    DISK_CACHE_DIR: str = "/tmp/sheets-api-cache"
+
+    DISK_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Request read access to Drive metadata at sign in, so cached worksheets
+    # can be revalidated by the spreadsheet's modification time
+    REQUEST_DRIVE_METADATA_SCOPE: bool = False
+
+    # Server-Sent Events subscriptions hold connections open, so they are only
+    # served by long-running deployments (ECS), never on Lambda
+    SUBSCRIPTIONS_ENABLED: bool = False
+
+    # Serve /cache-stats to signed in users, for operators debugging caching
+    CACHE_STATS_ENABLED: bool = False
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,181 @@
+import dataclasses
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from typing import Any, Optional
+
+from sheetsapi import lru_cache, shared_cache
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".snapshot"
+_LOCK_SUFFIX = ".lock"
+
+
+@dataclasses.dataclass
+class DiskCache(shared_cache.SharedCache):
+    """Cache of serialized snapshots in a local directory, shared by processes.
+
+    Every process on a host (e.g. uvicorn workers, or warm invocations of a
+    Lambda container) using the same directory sees the others' entries.
+    Entries are written to a temporary file and atomically renamed into
+    place, so readers never see partial writes. Payloads are memory-mapped
+    rather than read, so large bodies are not copied onto the heap. Fill
+    locks are `flock` locks, released by the OS if their holder dies.
+
+    Args:
+        directory: Directory to store entries in. Created if missing.
+        max_bytes: Total size of entries to keep. The least recently written
+            entries are removed when it is exceeded.
+    """
+
+    directory: str
+    max_bytes: int
+    stats: lru_cache.CacheStats = dataclasses.field(
+        default_factory=lru_cache.CacheStats
+    )
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False
+    )
+
+    def __post_init__(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def get(self, key: str) -> Optional[shared_cache.CacheEntry]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: empty file, which mmap refuses
+            self._count("misses")
+            return None
+
+        try:
+            # The payload stays backed by the mapping, which remains open for
+            # as long as it is referenced, even if the file is replaced
+            entry = shared_cache.decode_entry(mapped)
+        except Exception:
+            logger.exception(f"Failed to read cache entry {path}")
+            entry = None
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry
+
+    def peek(self, key: str) -> Optional[shared_cache.CacheEntryHeader]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                header = file.read(shared_cache.HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        if len(header) < shared_cache.HEADER_SIZE:
+            return None
+        try:
+            return shared_cache.decode_header(header)
+        except Exception:
+            logger.exception(f"Failed to read cache entry header {path}")
+            return None
+
+    def put(
+        self,
+        key: str,
+        metadata: Any,
+        payload: bytes,
+        ttl: float,
+        fresh_until: float = 0.0,
+    ) -> None:
+        # Written under a temporary name and renamed, so it appears atomically
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.writelines(
+                    shared_cache.encode_entry(metadata, payload, ttl, fresh_until)
+                )
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def try_lock(self, key: str, ttl: float) -> Optional[int]:
+        # The OS releases flock locks when their holder exits, so `ttl` is
+        # not needed to recover from crashes
+        path = self._path(key) + _LOCK_SUFFIX
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Holders remove the lock file on release, so a lock taken on a
+            # file that was removed meanwhile is not the current lock
+            locked = os.stat(path).st_ino == os.fstat(fd).st_ino
+        except (BlockingIOError, FileNotFoundError):
+            locked = False
+        if not locked:
+            os.close(fd)
+            return None
+        return fd
+
+    def unlock(self, key: str, token: int) -> None:
+        # Removed while still locked, so no other process can lock this file
+        try:
+            os.unlink(self._path(key) + _LOCK_SUFFIX)
+        except FileNotFoundError:
+            pass
+        os.close(token)
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            stats = dataclasses.asdict(self.stats)
+        entries = self._entries()
+        return {
+            **stats,
+            "entries": len(entries),
+            "current_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + _SUFFIX)
+
+    def _entries(self) -> list[tuple[str, int, float]]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process
+            entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _prune(self) -> None:
+        """Remove the oldest entries until the directory fits `max_bytes`."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._count("evictions")
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            setattr(self.stats, stat, getattr(self.stats, stat) + 1)
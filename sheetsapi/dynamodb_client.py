@@ -1,17 +1,189 @@
-from typing import Dict, List, Any, Optional
+import asyncio
+import base64
+import concurrent.futures
+import copy
+import dataclasses
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Any, Optional
 
 import boto3
+import botocore.config
+import botocore.exceptions
 from boto3.dynamodb.conditions import Key
-from sheetsapi import config
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from sheetsapi import config, lru_cache
+
+# Most items DynamoDB accepts in one BatchWriteItem request
+BATCH_WRITE_SIZE = 25
+
+BATCH_WRITE_WORKERS = 8
+
+# Unprocessed items are retried with exponential backoff, starting at
+# BATCH_WRITE_BACKOFF_SECONDS
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BACKOFF_SECONDS = 0.05
+
+
+class BatchWriteError(Exception):
+    """Raised when items are still unprocessed after every batch write retry."""
+
+
+@dataclasses.dataclass
+class ItemCache:
+    """Cache of API and user items read with `DynamoDBClient.get_item`.
+
+    Shared by every client in the process, so that short-lived clients
+    benefit too. Writes through any client update or invalidate the items
+    they touch. Writes from other processes are only seen once entries
+    expire, so `ttl` bounds how stale an item can be.
+
+    Args:
+        tables: Tables whose items are cached, keyed by an `id` attribute.
+        ttl: Seconds to keep items.
+        max_bytes: Maximum approximate size of all items, in bytes.
+    """
+
+    tables: frozenset[str]
+    ttl: float
+    max_bytes: int
+    _items: lru_cache.LRUCache = dataclasses.field(init=False)
+    # Incremented on every write, so reads that raced a write aren't cached
+    _writes: int = 0
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False
+    )
+
+    def __post_init__(self):
+        self._items = lru_cache.LRUCache(self.max_bytes, default_ttl=self.ttl)
+
+    def get(self, table: str, key: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
+        """Get a copy of a cached item, or None if it is not cached."""
+        if table not in self.tables:
+            return None
+        item = self._items.get(_cache_key(table, key))
+        return copy.deepcopy(item) if item is not None else None
+
+    def write_count(self) -> int:
+        """Number of writes so far, to pass to `fill` after reading an item."""
+        return self._writes
+
+    def fill(
+        self, table: str, key: Dict[str, Any], item: Dict[Any, Any], write_count: int
+    ) -> None:
+        """Cache an item read from DynamoDB, unless a write happened meanwhile.
+
+        Args:
+            table: Table name.
+            key: Key of the item.
+            item: The item read.
+            write_count: `write_count()` from before the item was read.
+        """
+        if table not in self.tables:
+            return
+        with self._lock:
+            if write_count == self._writes:
+                self._items.put(_cache_key(table, key), copy.deepcopy(item))
+
+    def put(self, table: str, item: Dict[Any, Any]) -> None:
+        """Cache an item just written in full."""
+        if table not in self.tables:
+            return
+        with self._lock:
+            self._writes += 1
+            self._items.put(_cache_key(table, {"id": item["id"]}), copy.deepcopy(item))
+
+    def invalidate(self, table: str, key: Dict[str, Any]) -> None:
+        """Drop an item that was changed or deleted."""
+        if table not in self.tables:
+            return
+        with self._lock:
+            self._writes += 1
+            self._items.delete(_cache_key(table, key))
+
+    def snapshot_stats(self) -> dict:
+        """Get cache counters along with current usage."""
+        return self._items.snapshot_stats()
+
+
+_default_item_cache: Optional[ItemCache] = None
+_default_item_cache_lock = threading.Lock()
+
+
+def default_item_cache() -> ItemCache:
+    """Get the item cache shared by clients created without one."""
+    global _default_item_cache
+    with _default_item_cache_lock:
+        if _default_item_cache is None:
+            _default_item_cache = ItemCache(
+                tables=frozenset([config.Config.Constants.SHEETS_API_TABLE]),
+                ttl=config.Config.Constants.ITEM_CACHE_TTL_SECONDS,
+                max_bytes=config.Config.Constants.ITEM_CACHE_MAX_BYTES,
+            )
+        return _default_item_cache
+
+
+def _cache_key(table: str, key: Dict[str, Any]) -> str:
+    return f"{table}:{json.dumps(key, sort_keys=True, default=str)}"
+
+
+_default_resource = None
+_default_client: Optional["DynamoDBClient"] = None
+_default_client_lock = threading.Lock()
+
+
+def default_resource():
+    """Get the DynamoDB resource shared by the process.
+
+    Creating a resource resolves credentials and endpoints, which takes tens
+    of milliseconds, and each resource has its own connection pool. Sharing
+    one keeps connections alive between requests.
+    """
+    global _default_resource
+    with _default_client_lock:
+        if _default_resource is None:
+            # Enough connections for the request and batch write thread pools
+            client_config = botocore.config.Config(
+                max_pool_connections=config.Config.Constants.DYNAMODB_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True,
+            )
+            _default_resource = boto3.resource(
+                "dynamodb",
+                region_name=config.Config.Constants.AWS_REGION,
+                config=client_config,
+            )
+        return _default_resource
+
+
+def default_client() -> "DynamoDBClient":
+    """Get the client shared by the process, e.g. for short-lived helpers."""
+    global _default_client
+    resource = default_resource()
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = DynamoDBClient(resource)
+        return _default_client
 
 
 class DynamoDBClient:
-    """Generic client for interacting with DynamoDB."""
+    """Generic client for interacting with DynamoDB.
 
-    def __init__(self, client=None):
-        self._client = client or boto3.resource(
-            "dynamodb", region_name=config.Config.Constants.AWS_REGION
-        )
+    Items read with `get_item` are cached, see `ItemCache`.
+    """
+
+    def __init__(self, client=None, item_cache: ItemCache = None):
+        self._client = client or default_resource()
+        self.item_cache = item_cache or default_item_cache()
+        # Table handles by name, as creating them is not free
+        self._tables: Dict[str, Any] = {}
+
+    def _table(self, table: str):
+        handle = self._tables.get(table)
+        if handle is None:
+            handle = self._tables[table] = self._client.Table(table)
+        return handle
 
     def get_item(self, table: str, key: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
         """Get single item from table.
@@ -22,7 +194,19 @@ class DynamoDBClient:
 
         Returns: Row if exists, None if missing.
         """
-        table = self._client.Table(table)
+        item = self.item_cache.get(table, key)
+        if item is not None:
+            return item
+
+        write_count = self.item_cache.write_count()
+        item = self._read_item(table, key)
+        if item is not None:
+            self.item_cache.fill(table, key, item, write_count)
+        return item
+
+    def _read_item(self, table: str, key: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
+        """Get single item from table, bypassing the item cache."""
+        table = self._table(table)
         result = table.get_item(Key=key)
 
         if "Item" not in result:
@@ -43,16 +227,82 @@ class DynamoDBClient:
 
         Returns: List of rows matching query.
         """
-        table = self._client.Table(table)
-        if index is None:
-            result = table.query(
-                KeyConditionExpression=Key(key).eq(value)
-            )  # query on primary key
-        else:
-            result = table.query(
-                IndexName=index, KeyConditionExpression=Key(key).eq(value)
-            )
-        return result["Items"]
+        params = {"KeyConditionExpression": Key(key).eq(value)}
+        if index is not None:
+            params["IndexName"] = index  # otherwise query on primary key
+        return list(self.query(table, params))
+
+    def query(
+        self, table: str, params: dict, page_size: Optional[int] = None
+    ) -> Iterator[dict]:
+        """Query a table, reading further pages as the results are consumed.
+
+        Args:
+            table: Table name.
+            params: Query parameters, e.g. KeyConditionExpression and
+                ProjectionExpression.
+            page_size: Items read per request. Defaults to as many as fit in
+                DynamoDB's 1 MB page.
+
+        Yields: Rows matching query.
+        """
+        for page in self._query_pages(table, params, page_size):
+            yield from page["Items"]
+
+    def query_page(
+        self, table: str, params: dict, limit: int, cursor: Optional[str] = None
+    ) -> tuple[List[dict], Optional[str]]:
+        """Get one page of query results, e.g. for a paginated HTTP response.
+
+        Args:
+            table: Table name.
+            params: Query parameters, as for `query`.
+            limit: Maximum number of items to return.
+            cursor: Cursor returned with the previous page, or None for the
+                first page.
+
+        Returns: The rows, and a cursor for the next page, or None if this is
+            the last page.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        request = {**params, "Limit": limit}
+        if cursor is not None:
+            request["ExclusiveStartKey"] = decode_cursor(cursor)
+        try:
+            result = self._table(table).query(**request)
+        except botocore.exceptions.ClientError as e:
+            # E.g. a cursor from a different query
+            if (
+                cursor is not None
+                and e.response["Error"]["Code"] == "ValidationException"
+            ):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            raise
+
+        last_key = result.get("LastEvaluatedKey")
+        return result["Items"], encode_cursor(last_key) if last_key else None
+
+    def count(self, table: str, params: dict) -> int:
+        """Count the items matching a query, without reading them."""
+        params = {**params, "Select": "COUNT"}
+        return sum(page["Count"] for page in self._query_pages(table, params))
+
+    def _query_pages(
+        self, table: str, params: dict, page_size: Optional[int] = None
+    ) -> Iterator[dict]:
+        """Send a query, following LastEvaluatedKey until the last page."""
+        table_obj = self._table(table)
+        request = dict(params)
+        if page_size is not None:
+            request["Limit"] = page_size
+        while True:
+            result = table_obj.query(**request)
+            yield result
+            if "LastEvaluatedKey" not in result:
+                return
+            request["ExclusiveStartKey"] = result["LastEvaluatedKey"]
 
     def put_item(self, table: str, item: Dict[str, Any]) -> None:
         """Add item to table.
@@ -61,12 +311,87 @@ class DynamoDBClient:
             table: Table name.
             item: Item to add in form {'<attribute_name>': <attribute_value>, ...}.
         """
-        table = self._client.Table(table)
-        table.put_item(Item=item)
+        table_obj = self._table(table)
+        table_obj.put_item(Item=item)
+        self.item_cache.put(table, item)
+
+    def batch_put_items(
+        self,
+        table: str,
+        items: Iterable[Dict[str, Any]],
+        overwrite_by_pkeys: Optional[List[str]] = None,
+        max_workers: int = BATCH_WRITE_WORKERS,
+    ) -> int:
+        """Add many items to a table with concurrent batch writes.
+
+        Items are written in batches of `BATCH_WRITE_SIZE`, several batches at
+        a time. Items DynamoDB leaves unprocessed, e.g. when throttling, are
+        retried with exponential backoff.
+
+        Args:
+            table: Table name.
+            items: Items to add. Consumed lazily, so it can be a generator.
+            overwrite_by_pkeys: Key attributes of the table. If given, an item
+                with the same key as an earlier one in the same batch replaces
+                it, as sequential puts would, instead of failing the batch.
+                Batches are written concurrently, so the order of writes to
+                the same key across batches is not guaranteed.
+            max_workers: Maximum number of batches written at once.
+
+        Returns: Number of items written.
+
+        Raises:
+            BatchWriteError: If items are still unprocessed after retrying.
+        """
+        written = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            pending = set()
+            for batch in _batches(items, overwrite_by_pkeys):
+                # Bound the batches held in memory when items is a generator
+                if len(pending) >= 2 * max_workers:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    written += sum(future.result() for future in done)
+                pending.add(pool.submit(self._write_batch, table, batch))
+            for future in concurrent.futures.as_completed(pending):
+                written += future.result()
+        return written
+
+    def _write_batch(self, table: str, batch: List[Dict[str, Any]]) -> int:
+        serializer = TypeSerializer()
+        requests = [
+            {
+                "PutRequest": {
+                    "Item": {k: serializer.serialize(v) for k, v in item.items()}
+                }
+            }
+            for item in batch
+        ]
+        client = self._client.meta.client
+        for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+            if attempt:
+                # Full jitter, so throttled batches don't retry in lockstep
+                backoff = BATCH_WRITE_BACKOFF_SECONDS * 2**attempt
+                time.sleep(random.uniform(0, backoff))
+            response = client.batch_write_item(RequestItems={table: requests})
+            requests = response.get("UnprocessedItems", {}).get(table, [])
+            if not requests:
+                break
+        else:
+            raise BatchWriteError(
+                f"{len(requests)} items still unprocessed after "
+                f"{BATCH_WRITE_MAX_ATTEMPTS} attempts. Table: {table}"
+            )
+
+        for item in batch:
+            self.item_cache.put(table, item)
+        return len(batch)
 
     def delete_item(self, table: str, key: Dict[str, Any]) -> None:
-        table = self._client.Table(table)
-        response = table.delete_item(Key=key, ReturnValues="ALL_OLD")
+        table_obj = self._table(table)
+        response = table_obj.delete_item(Key=key, ReturnValues="ALL_OLD")
+        self.item_cache.invalidate(table, key)
 
         if "Attributes" not in response:
             raise ValueError(f"Cannot delete item that does not exist. Key: {key}")
@@ -76,18 +401,17 @@ class DynamoDBClient:
 
         Returns: List of rows matching query.
         """
-        table = self._client.Table(table)
-        result = table.query(**params)
-        return result["Items"]
+        return list(self.query(table, params))
 
     def update_item(self, table: str, key: Dict[str, Any], item: Dict[str, Any]) -> Any:
         """Update an item with the given id.
 
         Keys in item that already exist will be updated, new keys will be added.
         """
-        table = self._client.Table(table)
+        table_obj = self._table(table)
 
-        if not self.get_item(config.Config.Constants.SHEETS_API_TABLE, key):
+        # Read past the cache, which may not know the item was deleted elsewhere
+        if not self._read_item(config.Config.Constants.SHEETS_API_TABLE, key):
             raise ValueError(f"Cannot update item that does not exist. Key: {key}")
 
         update_expression = []
@@ -102,23 +426,26 @@ class DynamoDBClient:
 
         update_expression = "SET " + ", ".join(update_expression)
 
-        response = table.update_item(
-            Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            ExpressionAttributeNames=expression_attribute_names,
-            ReturnValues="UPDATED_NEW",
-        )
+        try:
+            response = table_obj.update_item(
+                Key=key,
+                UpdateExpression=update_expression,
+                ExpressionAttributeValues=expression_attribute_values,
+                ExpressionAttributeNames=expression_attribute_names,
+                ReturnValues="UPDATED_NEW",
+            )
+        finally:
+            self.item_cache.invalidate(table, key)
         return response
 
     def increment_item_field(
         self, table: str, key: Dict[str, Any], field: str, decrement=False
     ) -> Any:
         """Increment the count of a field in an item. Also allows decrementing."""
-        table_obj = self._client.Table(table)
+        table_obj = self._table(table)
 
-        # Check if the item exists
-        if not self.get_item(table, key):
+        # Check if the item exists, past the cache
+        if not self._read_item(table, key):
             raise ValueError(
                 f"Cannot increment field for an item that does not exist. Key: {key}"
             )
@@ -133,11 +460,202 @@ class DynamoDBClient:
         expression_attribute_values = {":zero": 0, ":increment": adjustment_value}
 
         # Perform the update operation
-        response = table_obj.update_item(
-            Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="UPDATED_NEW",
-        )
+        try:
+            response = table_obj.update_item(
+                Key=key,
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=expression_attribute_names,
+                ExpressionAttributeValues=expression_attribute_values,
+                ReturnValues="UPDATED_NEW",
+            )
+        finally:
+            self.item_cache.invalidate(table, key)
         return response
+
+    def add_to_items_once(
+        self,
+        table: str,
+        increments: Iterable[tuple[Dict[str, Any], Dict[str, int], Dict[str, Any]]],
+        max_workers: int = BATCH_WRITE_WORKERS,
+    ) -> int:
+        """Atomically add to number fields of many items, at most once each.
+
+        Fields and items that don't exist yet are created, starting at zero.
+        Each addition is written in a transaction with a marker item, and
+        additions whose marker item already exists are skipped. Retrying a
+        partially applied batch with the same markers therefore only applies
+        what is missing.
+
+        Args:
+            table: Table name.
+            increments: Triples of an item key, the amounts to add to its
+                fields and the key of the marker item recording the addition.
+            max_workers: Maximum number of items updated at once.
+
+        Returns:
+            Number of additions applied.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            futures = [
+                pool.submit(self._add_to_item_with_marker, table, key, amounts, marker)
+                for key, amounts, marker in increments
+            ]
+            return sum(
+                future.result() for future in concurrent.futures.as_completed(futures)
+            )
+
+    def add_to_item_once(
+        self, table: str, key: Dict[str, Any], amounts: Dict[str, int], marker: str
+    ) -> bool:
+        """Atomically add to number fields of an item, unless done before.
+
+        The `marker` attribute is set along with the additions, and items
+        that already have it are left unchanged, so one-off adjustments are
+        applied once even if several processes attempt them.
+
+        Args:
+            table: Table name.
+            key: Key of the item.
+            amounts: Amounts to add to each field.
+            marker: Attribute recording that the amounts were added.
+
+        Returns: Whether the amounts were added.
+        """
+        try:
+            self._add_to_item(table, key, amounts, marker)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    def _add_to_item(
+        self,
+        table: str,
+        key: Dict[str, Any],
+        amounts: Dict[str, int],
+        marker: Optional[str] = None,
+    ) -> None:
+        request = _add_request(table, key, amounts, marker)
+        self._client.meta.client.update_item(**request)
+        self.item_cache.invalidate(table, key)
+
+    def _add_to_item_with_marker(
+        self,
+        table: str,
+        key: Dict[str, Any],
+        amounts: Dict[str, int],
+        marker_key: Dict[str, Any],
+    ) -> bool:
+        serializer = TypeSerializer()
+        put_marker = {
+            "TableName": table,
+            "Item": {k: serializer.serialize(v) for k, v in marker_key.items()},
+            "ConditionExpression": "attribute_not_exists(#key)",
+            "ExpressionAttributeNames": {"#key": next(iter(marker_key))},
+        }
+        try:
+            self._client.meta.client.transact_write_items(
+                TransactItems=[
+                    {"Put": put_marker},
+                    {"Update": _add_request(table, key, amounts)},
+                ]
+            )
+        except botocore.exceptions.ClientError as e:
+            reasons = e.response.get("CancellationReasons", [])
+            if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+                return False
+            raise
+        self.item_cache.invalidate(table, key)
+        return True
+
+
+def _add_request(
+    table: str,
+    key: Dict[str, Any],
+    amounts: Dict[str, int],
+    marker: Optional[str] = None,
+) -> Dict[str, Any]:
+    """UpdateItem parameters adding to number fields of an item.
+
+    If `marker` is given, the attribute is set too, on condition that the
+    item does not have it yet.
+    """
+    serializer = TypeSerializer()
+    # Placeholders, as field names like "2xx" aren't valid in expressions
+    names = {f"#f{i}": field for i, field in enumerate(amounts)}
+    values = {
+        f":f{i}": serializer.serialize(amount)
+        for i, amount in enumerate(amounts.values())
+    }
+    additions = ", ".join(f"#f{i} :f{i}" for i in range(len(amounts)))
+    request = {
+        "TableName": table,
+        "Key": {k: serializer.serialize(v) for k, v in key.items()},
+        "UpdateExpression": f"ADD {additions}",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+    if marker is not None:
+        names["#marker"] = marker
+        values[":marker"] = serializer.serialize(True)
+        request["UpdateExpression"] += " SET #marker = :marker"
+        request["ConditionExpression"] = "attribute_not_exists(#marker)"
+    return request
+
+
+def encode_cursor(key: Dict[str, Any]) -> str:
+    """Encode the LastEvaluatedKey of a query page as an opaque cursor."""
+    serializer = TypeSerializer()
+    serialized = {k: serializer.serialize(v) for k, v in key.items()}
+    return base64.urlsafe_b64encode(json.dumps(serialized).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode an opaque cursor into the ExclusiveStartKey of a query."""
+    deserializer = TypeDeserializer()
+    try:
+        serialized = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {k: deserializer.deserialize(v) for k, v in serialized.items()}
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _batches(
+    items: Iterable[Dict[str, Any]], overwrite_by_pkeys: Optional[List[str]]
+) -> Iterator[List[Dict[str, Any]]]:
+    """Split items into batches without duplicate keys."""
+    batch: dict = {}
+    for position, item in enumerate(items):
+        if overwrite_by_pkeys:
+            key = tuple(item[pkey] for pkey in overwrite_by_pkeys)
+            batch.pop(key, None)
+        else:
+            key = position
+        batch[key] = item
+        if len(batch) == BATCH_WRITE_SIZE:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+class AsyncDynamoDBClient:
+    """Async facade over `DynamoDBClient` for use from async request handlers.
+
+    boto3 is synchronous, so calls run in worker threads and keep the event
+    loop free while DynamoDB responds.
+    """
+
+    def __init__(self, client: DynamoDBClient = None):
+        self._sync = client or default_client()
+
+    async def get_item(
+        self, table: str, key: Dict[str, Any]
+    ) -> Optional[Dict[Any, Any]]:
+        """Async version of `DynamoDBClient.get_item`."""
+        # Cache hits don't need a thread
+        item = self._sync.item_cache.get(table, key)
+        if item is not None:
+            return item
+        return await asyncio.to_thread(self._sync.get_item, table, key)
@@ -1,12 +1,36 @@
+import asyncio
 import dataclasses
 import datetime
-from typing import Optional
+import hashlib
+import json
+import logging
+import mmap
+import time
+from typing import Any, Iterable, Optional
 import randomname
 import gspread
+import httpx
+from google.oauth2.credentials import Credentials
 
-from sheetsapi import dynamodb_client, lru_cache, auth_utils
+from sheetsapi import (
+    column_index,
+    columnar,
+    disk_cache,
+    dynamodb_client,
+    exporters,
+    lru_cache,
+    response_helpers,
+    auth_utils,
+    row_diff,
+    schema,
+    shared_cache,
+    single_flight,
+    sheets_values_client,
+)
 from sheetsapi.config import Config
 
+logger = logging.getLogger(__name__)
+
 
 class SheetNotFound(Exception):
     """Raised when a sheet is not found in the repository."""
@@ -20,14 +44,311 @@ class InvalidCredentials(Exception):
     """Raised when credentials are invalid."""
 
 
+DEFAULT_CDN_TTL = 15
+
+# Processes filling the same worksheet wait for each other through the shared
+# cache's fill lock, so only one of them fetches from Google
+FILL_LOCK_TTL_SECONDS = 30
+FILL_WAIT_SECONDS = 10
+FILL_POLL_SECONDS = 0.1
+
+
+@dataclasses.dataclass
+class SheetData:
+    """Cached worksheet rows and the API settings needed to serve them.
+
+    Args:
+        title: Title of the worksheet.
+        table: Parsed worksheet rows, stored by column.
+        body: The rows serialized as a JSON array, ready to send. A view of a
+            memory-mapped file when loaded from the disk cache.
+        etag: Hash of `body`, used for conditional requests and to detect
+            changes between fetches.
+        cdn_ttl: Seconds the data may be cached (in memory and by the CDN).
+        frozen: Whether the API is frozen and should not be served.
+        fetched_at: Unix time the records were fetched from Google.
+        indexes: Indexes over the API's configured index columns, in
+            configuration order.
+        column_schema: Inferred type of each column, in worksheet order.
+        modified_time: Drive modification time of the spreadsheet, checked
+            before the records were fetched. None if unknown.
+        version: Version of the records, derived from `etag` so that every
+            process gives the same records the same version.
+        changes: Row-level changes leading up to this version, oldest first.
+    """
+
+    title: str
+    table: columnar.ColumnarTable
+    body: bytes | memoryview
+    etag: str
+    cdn_ttl: int = DEFAULT_CDN_TTL
+    frozen: bool = False
+    fetched_at: float = dataclasses.field(default_factory=time.time)
+    indexes: dict[str, column_index.ColumnIndex] = dataclasses.field(
+        default_factory=dict
+    )
+    column_schema: list[schema.ColumnSchema] = dataclasses.field(default_factory=list)
+    modified_time: str | None = None
+    version: int = 0
+    changes: list[row_diff.RowChanges] = dataclasses.field(default_factory=list)
+    _encoded_bodies: dict[str, bytes] = dataclasses.field(
+        default_factory=dict, repr=False
+    )
+    _exports: dict[str, bytes] = dataclasses.field(default_factory=dict, repr=False)
+    _base_size: int | None = dataclasses.field(default=None, repr=False)
+
+    @classmethod
+    def build(cls, title: str, table: columnar.ColumnarTable, **kwargs) -> "SheetData":
+        """Create `SheetData`, serializing the rows once up front.
+
+        Args:
+            title: Title of the worksheet.
+            table: Parsed worksheet rows.
+            kwargs: Other `SheetData` fields.
+
+        Returns:
+            The sheet data.
+        """
+        body = json.dumps(
+            table.to_records(),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()
+        kwargs.setdefault("version", content_version(etag))
+        return cls(title=title, table=table, body=body, etag=etag, **kwargs)
+
+    def age(self) -> float:
+        """Seconds since the records were fetched."""
+        return time.time() - self.fetched_at
+
+    def is_fresh(self) -> bool:
+        """Whether the records are within their `cdn_ttl`."""
+        return self.age() < self.cdn_ttl
+
+    def encode_bodies(self) -> None:
+        """Compress the body in every supported content encoding.
+
+        Called when the data is cached, in a worker thread, so responses never
+        compress on the event loop.
+        """
+        for encoding in response_helpers.ENCODINGS:
+            self.encoded_body(encoding)
+
+    def encoded_body(self, encoding: str | None) -> bytes:
+        """The serialized rows in a content encoding, compressed on first use.
+
+        Args:
+            encoding: "gzip", "br", or None for the uncompressed body.
+
+        Returns:
+            The encoded body.
+        """
+        if encoding is None:
+            # Responses need bytes, so memory-mapped bodies are copied here
+            return bytes(self.body)
+        if encoding not in self._encoded_bodies:
+            self._encoded_bodies[encoding] = response_helpers.compress(
+                self.body, encoding
+            )
+        return self._encoded_bodies[encoding]
+
+    def export(self, export_format: str) -> bytes:
+        """The rows in a binary export format, serialized on first use.
+
+        Exports are CPU-bound, so call this from a worker thread.
+
+        Args:
+            export_format: A format in `exporters.MEDIA_TYPES`.
+
+        Returns:
+            The serialized rows.
+        """
+        if export_format not in self._exports:
+            self._exports[export_format] = exporters.export(self.table, export_format)
+        return self._exports[export_format]
+
+    def nbytes(self) -> int:
+        """Approximate memory footprint, for the in-memory cache's budget.
+
+        The rows and indexes are measured once; encoded bodies and exports
+        are added as they are filled.
+        """
+        if self._base_size is None:
+            self._base_size = lru_cache.approximate_size(
+                (self.table, self.indexes, self.column_schema, self.changes)
+            )
+        body_size = len(self.body)
+        if isinstance(self.body, memoryview):
+            # A view keeps its whole buffer alive, e.g. an entry read from
+            # Redis. Memory-mapped files are backed by the page cache instead.
+            buffer = self.body.obj
+            body_size = 0 if isinstance(buffer, mmap.mmap) else len(buffer)
+        return (
+            self._base_size
+            + body_size
+            + sum(len(body) for body in self._encoded_bodies.values())
+            + sum(len(export) for export in self._exports.values())
+        )
+
+    def records(self) -> list[dict]:
+        """Materialize every row as a dict keyed by header."""
+        return self.table.to_records()
+
+    def get_row(self, key: str, column: str | None = None) -> dict | None:
+        """Look up a single row through an index.
+
+        Args:
+            key: Value of the index column to look up.
+            column: Index column to use. Defaults to the first configured one.
+
+        Returns:
+            The first matching row, or None if no row matches.
+        """
+        if column is None:
+            column = next(iter(self.indexes), None)
+        if column not in self.indexes:
+            raise KeyError(f"Column {column} is not indexed.")
+        positions = self.indexes[column].lookup(key)
+        return self.table.row(positions[0]) if positions else None
+
+    def to_snapshot(self) -> tuple[dict, bytes | memoryview]:
+        """Split into JSON-serializable metadata and the body, for the shared cache.
+
+        Only what cannot be derived from the body is kept in the metadata:
+        the rows are rebuilt from the body and indexes from their column
+        names. Encoded bodies and exports are left out; each process
+        compresses the body when it loads the snapshot and exports on first
+        use.
+        """
+        metadata = {
+            "title": self.title,
+            "headers": list(self.table.headers),
+            "column_types": list(self.table.column_types),
+            "etag": self.etag,
+            "cdn_ttl": self.cdn_ttl,
+            "frozen": self.frozen,
+            "fetched_at": self.fetched_at,
+            "indexes": list(self.indexes),
+            "column_schema": [dataclasses.asdict(c) for c in self.column_schema],
+            "modified_time": self.modified_time,
+            "version": self.version,
+            "changes": [changes.to_snapshot() for changes in self.changes],
+        }
+        return metadata, self.body
+
+    @classmethod
+    def from_snapshot(cls, metadata: dict, body: bytes | memoryview) -> "SheetData":
+        """Reassemble data split by `to_snapshot`."""
+        table = columnar.ColumnarTable.from_records(
+            tuple(metadata["headers"]),
+            json.loads(bytes(body)),
+            tuple(metadata["column_types"]),
+        )
+        return cls(
+            title=metadata["title"],
+            table=table,
+            body=body,
+            etag=metadata["etag"],
+            cdn_ttl=metadata["cdn_ttl"],
+            frozen=metadata["frozen"],
+            fetched_at=metadata["fetched_at"],
+            indexes=column_index.build_indexes(metadata["indexes"], table),
+            column_schema=[
+                schema.ColumnSchema(**column) for column in metadata["column_schema"]
+            ],
+            modified_time=metadata["modified_time"],
+            version=metadata["version"],
+            changes=[
+                row_diff.RowChanges.from_snapshot(changes)
+                for changes in metadata["changes"]
+            ],
+        )
+
+    def continue_history(self, previous: "SheetData", key_columns: list[str]) -> None:
+        """Carry over the version history of the previous records.
+
+        If the records changed, the row changes since `previous` are
+        appended to the bounded change history.
+
+        Args:
+            previous: Previously cached records of the same worksheet.
+            key_columns: Candidate columns identifying rows, in order of
+                preference. Rows are identified by row number if none is unique.
+        """
+        if previous.etag == self.etag:
+            self.version = previous.version
+            self.changes = previous.changes
+            return
+
+        key_column = row_diff.key_column_for(self.table, key_columns)
+        if key_column and row_diff.key_column_for(previous.table, [key_column]) is None:
+            key_column = None
+        changes = row_diff.diff(
+            previous.table, self.table, previous.version, self.version, key_column
+        )
+        if changes.size() > len(self.table) // 2:
+            # Clients are better off refetching everything than replaying
+            # large diffs, so don't spend memory keeping them
+            self.changes = []
+            return
+        history_length = Config.Constants.CHANGE_HISTORY_LENGTH
+        self.changes = (previous.changes + [changes])[-history_length:]
+
+    def changes_since(self, since: int) -> row_diff.RowChanges | None:
+        """Row-level changes from a previous version to this one.
+
+        Args:
+            since: Version the client has.
+
+        Returns:
+            The changes, or None if `since` is not in the change history.
+        """
+        if since == self.version:
+            key_column = self.changes[-1].key_column if self.changes else None
+            return row_diff.RowChanges(
+                since=since, version=self.version, key_column=key_column
+            )
+        return row_diff.compose(self.changes, since)
+
+    def cache_control(self) -> str:
+        """Cache-Control header value for serving these records."""
+        return (
+            f"max-age={self.cdn_ttl}, "
+            f"stale-while-revalidate={Config.Constants.STALE_WHILE_REVALIDATE_SECONDS}, "
+            f"stale-if-error={Config.Constants.STALE_IF_ERROR_SECONDS}, public"
+        )
+
+
 @dataclasses.dataclass
 class GoogleSheets:
     repository: dynamodb_client.DynamoDBClient = dataclasses.field(
-        default_factory=dynamodb_client.DynamoDBClient
+        default_factory=dynamodb_client.default_client
     )
     hot_worksheet_cache: lru_cache.LRUCache = dataclasses.field(
-        default_factory=lambda: lru_cache.LRUCache(10)
+        default_factory=lambda: lru_cache.LRUCache(
+            Config.Constants.HOT_CACHE_MAX_BYTES, size_of=_cached_size
+        )
+    )
+    shared_worksheet_cache: shared_cache.SharedCache | None = dataclasses.field(
+        default_factory=lambda: _default_shared_cache()
+    )
+    async_repository: dynamodb_client.AsyncDynamoDBClient = None
+    credential_pool: auth_utils.CredentialPool = None
+    values_client: sheets_values_client.AsyncSheetsValuesClient = dataclasses.field(
+        default_factory=sheets_values_client.AsyncSheetsValuesClient
     )
+    async_in_flight: single_flight.AsyncSingleFlight = dataclasses.field(
+        default_factory=single_flight.AsyncSingleFlight
+    )
+    _background_tasks: set = dataclasses.field(default_factory=set)
+
+    def __post_init__(self):
+        if self.async_repository is None:
+            self.async_repository = dynamodb_client.AsyncDynamoDBClient(self.repository)
+        if self.credential_pool is None:
+            self.credential_pool = auth_utils.CredentialPool(self.repository)
 
     def add_sheet_to_repository(
         self,
@@ -50,8 +371,9 @@ class GoogleSheets:
             raise SheetAlreadyExists(f"Sheet with ID {sheet_id} already in repository.")
 
         name = _generate_api_name(self.repository)
-        user_client = auth_creds.init_gspread_client()
+        user_client = self.credential_pool.gspread_client(auth_creds)
         sheet = user_client.open_by_key(sheet_id)
+        auth_creds = self.credential_pool.current_fields(auth_creds)
         self.repository.put_item(
             Config.Constants.SHEETS_API_TABLE,
             item={
@@ -61,7 +383,7 @@ class GoogleSheets:
                 "spreadsheet_name": sheet.title,
                 "api_name": name,
                 "auth_creds": dataclasses.asdict(auth_creds),
-                "cdn_ttl": 15,
+                "cdn_ttl": DEFAULT_CDN_TTL,
                 "created_at": datetime.datetime.now().isoformat(),
             },
         )
@@ -73,43 +395,505 @@ class GoogleSheets:
 
         return name
 
-    def get_sheet_data(self, name: str, worksheet_name: str = "Sheet1"):
+    async def get_sheet_data_async(
+        self, name: str, worksheet_name: str = "Sheet1"
+    ) -> SheetData:
         """Get data from a Google Sheet by name.
 
+        Records are cached in memory for the API's `cdn_ttl`, so hot APIs are
+        served without touching DynamoDB or Google. Concurrent cache misses for
+        the same worksheet share a single upstream fetch.
+
+        Once records pass their `cdn_ttl` they are still served for up to
+        `STALE_WHILE_REVALIDATE_SECONDS` while a background refresh runs. If a
+        refresh fails, stale records are served for up to
+        `STALE_IF_ERROR_SECONDS` instead of raising.
+
+        Values are fetched with the pooled async Sheets client and background
+        refreshes run as asyncio tasks. Parsing and serializing fetched values
+        runs in a worker thread, so large worksheets don't stall the event loop.
+
+        Args:
+            name: The name of the sheet in the repository.
+            worksheet_name: The name of the sheet within the Google Sheet.
+
+        Returns:
+            The data from the Google Sheet.
+        """
+        cached = await self._get_cached_async(name, worksheet_name)
+        if _is_servable(cached):
+            if not cached.is_fresh():
+                self._schedule_refresh_async(name, worksheet_name)
+            return cached
+
+        try:
+            return await self.async_in_flight.do(
+                (name, worksheet_name),
+                lambda: self._load_sheet_data_async(name, worksheet_name),
+            )
+        except SheetNotFound:
+            await asyncio.to_thread(self.evict, name, [worksheet_name])
+            raise
+        except gspread.exceptions.WorksheetNotFound:
+            raise
+        except Exception:
+            if cached is None:
+                raise
+            logger.exception(
+                f"Failed to refresh {name}/{worksheet_name}, serving stale data"
+            )
+            return cached
+
+    async def refresh_sheet_data_async(
+        self, name: str, worksheet_name: str = "Sheet1"
+    ) -> SheetData:
+        """Get data from a Google Sheet, revalidating it now if it is not fresh.
+
+        Unlike `get_sheet_data_async`, stale data is not returned while it is
+        refreshed in the background, so callers always see the latest version.
+
         Args:
             name: The name of the sheet in the repository.
-            worksheet: The name of the sheet within the Google Sheet.
+            worksheet_name: The name of the sheet within the Google Sheet.
 
         Returns:
             The data from the Google Sheet.
         """
-        worksheet: gspread.worksheet.Worksheet | None = self.hot_worksheet_cache.get(
-            f"{name}-{worksheet_name}"
+        return await self.async_in_flight.do(
+            (name, worksheet_name),
+            lambda: self._load_sheet_data_async(name, worksheet_name),
         )
-        if worksheet is not None:
-            return {
-                "title": worksheet.title,
-                "data": worksheet.get_all_records(),
-                "cdn_ttl": 15,  # todo: save this in the repository
-                "frozen": False,  # TODO: keep frozen status in cache
-            }  # TODO: make this a dataclass/pydantic model instead
 
-        sheet = self.repository.get_item(
+    async def export_async(
+        self, name: str, sheet_data: SheetData, export_format: str
+    ) -> bytes:
+        """Export a whole worksheet, caching the export with its data.
+
+        The export is serialized in a worker thread on first use, and then
+        counts towards the in-memory cache's budget.
+
+        Args:
+            name: The name of the sheet in the repository.
+            sheet_data: The worksheet's data.
+            export_format: A format in `exporters.MEDIA_TYPES`.
+
+        Returns:
+            The serialized rows.
+        """
+        body = await asyncio.to_thread(sheet_data.export, export_format)
+        self.hot_worksheet_cache.resize(f"{name}-{sheet_data.title}")
+        return body
+
+    def _schedule_refresh_async(self, name: str, worksheet_name: str) -> None:
+        """Refresh a worksheet in a background asyncio task."""
+        key = (name, worksheet_name)
+
+        async def refresh():
+            try:
+                await self.async_in_flight.do(
+                    key, lambda: self._load_sheet_data_async(*key)
+                )
+            except SheetNotFound:
+                # The API was deleted, so stop serving what is cached
+                logger.info(f"{name} no longer exists, evicting it")
+                await asyncio.to_thread(self.evict, name, [worksheet_name])
+            except Exception:
+                logger.exception(
+                    f"Background refresh of {name}/{worksheet_name} failed"
+                )
+
+        # Hold a reference so the task is not garbage collected mid-flight
+        task = asyncio.create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _load_sheet_data_async(self, name: str, worksheet_name: str) -> SheetData:
+        """Fetch worksheet records from Google and cache them.
+
+        With a shared cache, only one process at a time fetches a worksheet;
+        the others wait for its result instead of fetching it too.
+        """
+        cached = await self._get_cached_async(name, worksheet_name)
+        if cached is not None and cached.is_fresh():
+            return cached
+
+        key = f"{name}-{worksheet_name}"
+        filled, token = await self._acquire_fill_async(key)
+        if filled is not None:
+            return filled
+        try:
+            sheet_data = await self._fetch_sheet_data_async(
+                name, worksheet_name, cached
+            )
+            await asyncio.to_thread(self._put_shared, sheet_data, name)
+            return sheet_data
+        finally:
+            if token is not None:
+                await asyncio.to_thread(self._release_fill, key, token)
+
+    async def _fetch_sheet_data_async(
+        self, name: str, worksheet_name: str, cached: SheetData | None
+    ) -> SheetData:
+        """Fetch worksheet records from Google and cache them in memory.
+
+        If stale records are cached, the spreadsheet's Drive modification time
+        is checked first and the values are only refetched if it changed.
+        """
+        sheet, credentials = await self._get_api_credentials_async(name)
+        modified_time = None
+        if cached is not None:
+            modified_time = await self._get_modified_time_async(
+                credentials, sheet["sheet_id"]
+            )
+            if _is_unchanged(cached, modified_time):
+                return await asyncio.to_thread(
+                    self._revalidate_sheet_data, name, sheet, cached
+                )
+
+        values = await self.values_client.get_values(
+            credentials, sheet["sheet_id"], worksheet_name
+        )
+        return await asyncio.to_thread(
+            self._cache_sheet_data, name, worksheet_name, sheet, values, modified_time
+        )
+
+    async def get_sheets_data_async(
+        self, name: str, worksheet_names: list[str] | None = None
+    ) -> dict[str, SheetData]:
+        """Get data from several worksheets of a Google Sheet at once.
+
+        Worksheets that are not cached are fetched together in a single values
+        batchGet request. Cached worksheets follow the same freshness rules as
+        `get_sheet_data_async`.
+
+        Args:
+            name: The name of the sheet in the repository.
+            worksheet_names: The names of the sheets within the Google Sheet.
+                If None, all worksheets are returned. Listing them costs an
+                extra metadata request, cached like the worksheets' data.
+
+        Returns:
+            The data from each worksheet, keyed by worksheet name.
+        """
+        if worksheet_names is None:
+            worksheet_names = await self._get_worksheet_titles_async(name)
+
+        result: dict[str, SheetData] = {}
+        stale: dict[str, SheetData] = {}
+        missing = []
+        for worksheet_name in worksheet_names:
+            cached = await self._get_cached_async(name, worksheet_name)
+            if _is_servable(cached):
+                if not cached.is_fresh():
+                    self._schedule_refresh_async(name, worksheet_name)
+                result[worksheet_name] = cached
+            else:
+                missing.append(worksheet_name)
+                if cached is not None:
+                    stale[worksheet_name] = cached
+
+        if missing:
+            try:
+                result.update(
+                    await self.async_in_flight.do(
+                        (name, tuple(missing)),
+                        lambda: self._load_sheets_data_async(name, missing),
+                    )
+                )
+            except SheetNotFound:
+                await asyncio.to_thread(self.evict, name, worksheet_names)
+                raise
+            except gspread.exceptions.WorksheetNotFound:
+                raise
+            except Exception:
+                if len(stale) < len(missing):
+                    raise
+                logger.exception(f"Failed to refresh {name}, serving stale data")
+                result.update(stale)
+
+        return {
+            worksheet_name: result[worksheet_name] for worksheet_name in worksheet_names
+        }
+
+    async def _get_worksheet_titles_async(self, name: str) -> list[str]:
+        """Get the titles of an API's worksheets, cached for its `cdn_ttl`."""
+        key = f"{name}#titles"
+        titles: list[str] | None = self.hot_worksheet_cache.get(key)
+        if titles is None:
+            sheet, credentials = await self._get_api_credentials_async(name)
+            titles = await self.values_client.get_worksheet_titles(
+                credentials, sheet["sheet_id"]
+            )
+            self.hot_worksheet_cache.put(
+                key, titles, ttl=int(sheet.get("cdn_ttl", DEFAULT_CDN_TTL))
+            )
+        return titles
+
+    async def _load_sheets_data_async(
+        self, name: str, worksheet_names: list[str]
+    ) -> dict[str, SheetData]:
+        """Fetch several worksheets in one request and cache them.
+
+        Stale cached worksheets are revalidated without refetching if the
+        spreadsheet has not been modified since they were fetched. Unlike
+        single worksheet loads, these don't take the shared fill lock.
+        """
+        sheet, credentials = await self._get_api_credentials_async(name)
+        cached = {
+            worksheet_name: await self._get_cached_async(name, worksheet_name)
+            for worksheet_name in worksheet_names
+        }
+        result: dict[str, SheetData] = {}
+        modified_time = None
+        if any(data is not None for data in cached.values()):
+            modified_time = await self._get_modified_time_async(
+                credentials, sheet["sheet_id"]
+            )
+            for worksheet_name, data in cached.items():
+                if _is_unchanged(data, modified_time):
+                    result[worksheet_name] = await asyncio.to_thread(
+                        self._revalidate_sheet_data, name, sheet, data
+                    )
+
+        missing = [n for n in worksheet_names if n not in result]
+        if missing:
+            values_by_worksheet = await self.values_client.batch_get_values(
+                credentials, sheet["sheet_id"], missing
+            )
+            for worksheet_name, values in values_by_worksheet.items():
+                result[worksheet_name] = await asyncio.to_thread(
+                    self._cache_sheet_data,
+                    name,
+                    worksheet_name,
+                    sheet,
+                    values,
+                    modified_time,
+                )
+        for sheet_data in result.values():
+            await asyncio.to_thread(self._put_shared, sheet_data, name)
+        return result
+
+    async def _get_api_credentials_async(self, name: str) -> tuple[dict, Credentials]:
+        """Get an API item from the repository along with pooled credentials."""
+        sheet = await self.async_repository.get_item(
             Config.Constants.SHEETS_API_TABLE, {"id": f"sheet-{name}"}
         )
         if sheet is None:
             raise SheetNotFound(f"Sheet with name {name} not found in repository.")
         auth_creds = auth_utils.GoogleOauthFields(**sheet["auth_creds"])
 
-        client = auth_creds.init_gspread_client()
-        google_sheet = client.open_by_key(sheet["sheet_id"])
-        worksheet = google_sheet.worksheet(worksheet_name)
-        self.hot_worksheet_cache.put(f"{name}-{worksheet_name}", worksheet)
-        return {
-            "title": worksheet.title,
-            "data": worksheet.get_all_records(),
-            "cdn_ttl": sheet.get("cdn_ttl", 15),
-        }  # TODO: make this a dataclass/pydantic model instead
+        if self.credential_pool.flush_due():
+            await asyncio.to_thread(self.credential_pool.flush)
+        return sheet, self.credential_pool.credentials(auth_creds, sheet["id"])
+
+    async def _get_cached_async(
+        self, name: str, worksheet_name: str
+    ) -> SheetData | None:
+        """Get cached data, falling back to data cached by other processes.
+
+        The shared cache is read in a worker thread.
+        """
+        key = f"{name}-{worksheet_name}"
+        cached: SheetData | None = self.hot_worksheet_cache.get(key)
+        if cached is None and self.shared_worksheet_cache is not None:
+            cached = await asyncio.to_thread(self._get_shared, key)
+        return cached
+
+    def evict(self, name: str, worksheet_names: Iterable[str]) -> None:
+        """Drop an API's worksheets from the in-memory and shared caches.
+
+        Worksheets in the cached list of the API's worksheet titles are
+        dropped too. Other processes' in-memory caches keep their copies
+        until they expire.
+
+        Args:
+            name: The name of the sheet in the repository.
+            worksheet_names: Names of the worksheets to drop.
+        """
+        titles_key = f"{name}#titles"
+        worksheet_names = set(worksheet_names)
+        worksheet_names.update(self.hot_worksheet_cache.get(titles_key) or [])
+        self.hot_worksheet_cache.delete(titles_key)
+        for worksheet_name in worksheet_names:
+            key = f"{name}-{worksheet_name}"
+            self.hot_worksheet_cache.delete(key)
+            if self.shared_worksheet_cache is None:
+                continue
+            try:
+                self.shared_worksheet_cache.delete(key)
+            except Exception:
+                logger.exception(f"Failed to delete {key} from the shared cache")
+
+    def _get_shared(self, key: str) -> SheetData | None:
+        """Read data from the shared cache into the in-memory cache."""
+        entry = self.shared_worksheet_cache.get(key)
+        if entry is None:
+            return None
+        cached = SheetData.from_snapshot(entry.metadata, entry.payload)
+        cached.encode_bodies()
+        self.hot_worksheet_cache.put(key, cached, ttl=entry.ttl())
+        return cached
+
+    def _get_shared_if_fresh(self, key: str) -> SheetData | None:
+        """Like `_get_shared`, but only if the entry's header says it is fresh."""
+        header = self.shared_worksheet_cache.peek(key)
+        if header is None or not header.is_fresh():
+            return None
+        return self._get_shared(key)
+
+    def _put_shared(self, sheet_data: SheetData, name: str) -> None:
+        """Write data to the shared cache, if there is one."""
+        if self.shared_worksheet_cache is None:
+            return
+        key = f"{name}-{sheet_data.title}"
+        try:
+            metadata, body = sheet_data.to_snapshot()
+            self.shared_worksheet_cache.put(
+                key,
+                metadata,
+                body,
+                ttl=_cache_ttl(sheet_data),
+                fresh_until=sheet_data.fetched_at + sheet_data.cdn_ttl,
+            )
+        except Exception:
+            # The shared tier is an optimization; keep serving from memory
+            logger.exception(f"Failed to write {key} to the shared cache")
+
+    async def _acquire_fill_async(self, key: str) -> tuple[SheetData | None, Any]:
+        """Take the shared fill lock of a worksheet, or wait for another fill.
+
+        Returns:
+            Fresh data filled by another process while waiting, or the lock
+            token. The token is None if there is no shared cache or the wait
+            timed out, in which case the caller fetches without the lock.
+        """
+        if self.shared_worksheet_cache is None:
+            return None, None
+        deadline = time.monotonic() + FILL_WAIT_SECONDS
+        while True:
+            try:
+                token = await asyncio.to_thread(
+                    self.shared_worksheet_cache.try_lock, key, FILL_LOCK_TTL_SECONDS
+                )
+            except Exception:
+                logger.exception(f"Failed to take the fill lock of {key}")
+                return None, None
+            # The previous holder may have filled the cache just before we
+            # got the lock. Only the header is read until then, rather than
+            # decoding a stale entry on every poll.
+            filled = await asyncio.to_thread(self._get_shared_if_fresh, key)
+            if filled is not None and filled.is_fresh():
+                await asyncio.to_thread(self._release_fill, key, token)
+                return filled, None
+            if token is not None or time.monotonic() >= deadline:
+                return None, token
+            await asyncio.sleep(FILL_POLL_SECONDS)
+
+    def _release_fill(self, key: str, token: Any) -> None:
+        if token is None:
+            return
+        try:
+            self.shared_worksheet_cache.unlock(key, token)
+        except Exception:
+            # Locks expire on their own, so a failed release only delays fills
+            logger.exception(f"Failed to release the fill lock of {key}")
+
+    async def _get_modified_time_async(
+        self, credentials: Credentials, spreadsheet_id: str
+    ) -> str | None:
+        """Get a spreadsheet's Drive modification time, or None if unavailable.
+
+        APIs created before the Drive metadata scope was requested get a 403,
+        in which case the worksheet is simply refetched.
+        """
+        try:
+            return await self.values_client.get_modified_time(
+                credentials, spreadsheet_id
+            )
+        except (sheets_values_client.SheetsAPIError, httpx.HTTPError) as e:
+            logger.warning(f"Failed to get Drive metadata of {spreadsheet_id}: {e}")
+            return None
+
+    def _revalidate_sheet_data(
+        self, name: str, sheet: dict, cached: SheetData
+    ) -> SheetData:
+        """Mark cached records as fresh again without refetching them.
+
+        API settings are taken from the current repository item, so changes
+        to `cdn_ttl`, `frozen` or the index columns still apply. Indexes may
+        be rebuilt, so this runs in a worker thread.
+
+        Args:
+            name: The name of the sheet in the repository.
+            sheet: The API item from the repository.
+            cached: The unchanged cached data.
+
+        Returns:
+            The revalidated data.
+        """
+        index_columns = sheet.get("index_columns", [])
+        indexes = cached.indexes
+        if list(indexes) != [c for c in index_columns if cached.table.has_column(c)]:
+            indexes = column_index.build_indexes(index_columns, cached.table)
+        sheet_data = dataclasses.replace(
+            cached,
+            cdn_ttl=int(sheet.get("cdn_ttl", DEFAULT_CDN_TTL)),
+            frozen=bool(sheet.get("frozen", False)),
+            fetched_at=time.time(),
+            indexes=indexes,
+            _base_size=None,
+        )
+        self._store_sheet_data(name, sheet_data)
+        return sheet_data
+
+    def _cache_sheet_data(
+        self,
+        name: str,
+        title: str,
+        sheet: dict,
+        values: list[list],
+        modified_time: str | None = None,
+    ) -> SheetData:
+        """Build `SheetData` for fetched rows and store it in the cache.
+
+        Parsing, serializing, compressing, indexing and diffing against the
+        previous version are CPU-bound, so this runs in a worker thread.
+
+        Args:
+            name: The name of the sheet in the repository.
+            title: The title of the worksheet.
+            sheet: The API item from the repository.
+            values: The worksheet rows, as returned by the values API.
+            modified_time: Drive modification time checked before the rows
+                were fetched, if any.
+
+        Returns:
+            The cached data.
+        """
+        # Stale data was loaded into memory before fetching, if there was any
+        previous = self.hot_worksheet_cache.get(f"{name}-{title}")
+        # Types are inferred once per fetch, before serializing and indexing
+        table = columnar.ColumnarTable.from_values(values)
+        table, column_schema = schema.apply_schema(table)
+        sheet_data = SheetData.build(
+            title,
+            table,
+            cdn_ttl=int(sheet.get("cdn_ttl", DEFAULT_CDN_TTL)),
+            frozen=bool(sheet.get("frozen", False)),
+            indexes=column_index.build_indexes(sheet.get("index_columns", []), table),
+            column_schema=column_schema,
+            modified_time=modified_time,
+        )
+        if previous is not None:
+            sheet_data.continue_history(previous, sheet.get("index_columns", []))
+        sheet_data.encode_bodies()
+        self._store_sheet_data(name, sheet_data)
+        return sheet_data
+
+    def _store_sheet_data(self, name: str, sheet_data: SheetData) -> None:
+        self.hot_worksheet_cache.put(
+            f"{name}-{sheet_data.title}", sheet_data, ttl=_cache_ttl(sheet_data)
+        )
 
     def get_sheet_name_from_id(self, sheet_id: str) -> Optional[str]:
         """Get the name of a sheet in the repository by Google Sheet ID."""
@@ -149,10 +933,23 @@ class GoogleSheets:
             raise SheetNotFound(f"Sheet with name {name} not found in repository.")
 
         auth_creds = auth_utils.GoogleOauthFields(**sheet["auth_creds"])
-        client = auth_creds.init_gspread_client()
+        client = self.credential_pool.gspread_client(auth_creds, sheet["id"])
         sheet = client.open_by_key(sheet["sheet_id"])
         return [worksheet.title for worksheet in sheet.worksheets()]
 
+    def set_index_columns(self, name: str, columns: list[str]) -> None:
+        """Set the columns indexed when the API's worksheets are cached.
+
+        Args:
+            name: The name of the sheet in the repository.
+            columns: Column (header) names to index.
+        """
+        self.repository.update_item(
+            Config.Constants.SHEETS_API_TABLE,
+            key={"id": f"sheet-{name}"},
+            item={"index_columns": columns},
+        )
+
     def get_sheet_info(self, name: str) -> tuple[dict, list[str]]:
         """Get the API from storage by name, and also return all the worksheets available"""
 
@@ -163,12 +960,70 @@ class GoogleSheets:
             raise SheetNotFound(f"Sheet with name {name} not found in repository.")
 
         auth_creds = auth_utils.GoogleOauthFields(**sheet["auth_creds"])
-        client = auth_creds.init_gspread_client()
+        client = self.credential_pool.gspread_client(auth_creds, sheet["id"])
         spreadsheet = client.open_by_key(sheet["sheet_id"])
         worksheets = [worksheet.title for worksheet in spreadsheet.worksheets()]
         return sheet, worksheets
 
 
+def content_version(etag: str) -> int:
+    """Version of records with the given etag.
+
+    The first 52 bits of the hash, so versions are exact in JavaScript.
+    Versions identify records but are not ordered.
+    """
+    return int(etag[:13], 16)
+
+
+def _default_shared_cache() -> shared_cache.SharedCache | None:
+    """Create the shared cache tier selected by `CACHE_BACKEND`."""
+    backend = Config.Constants.CACHE_BACKEND
+    if backend == "memory":
+        return None
+    if backend == "disk":
+        if not Config.Constants.DISK_CACHE_DIR:
+            return None
+        return disk_cache.DiskCache(
+            Config.Constants.DISK_CACHE_DIR, Config.Constants.DISK_CACHE_MAX_BYTES
+        )
+    if backend == "redis":
+        return shared_cache.RedisCache.from_url(Config.Constants.REDIS_URL)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+def _cached_size(value: Any) -> int:
+    """Approximate size of a value in the in-memory cache, in bytes."""
+    if isinstance(value, SheetData):
+        return value.nbytes()
+    return lru_cache.approximate_size(value)
+
+
+def _cache_ttl(sheet_data: SheetData) -> int:
+    """Seconds to keep data cached, including the windows it may be served stale."""
+    stale_window = max(
+        Config.Constants.STALE_WHILE_REVALIDATE_SECONDS,
+        Config.Constants.STALE_IF_ERROR_SECONDS,
+    )
+    return sheet_data.cdn_ttl + stale_window
+
+
+def _is_servable(cached: SheetData | None) -> bool:
+    """Whether cached data is fresh or still within stale-while-revalidate."""
+    if cached is None:
+        return False
+    stale_age = cached.age() - cached.cdn_ttl
+    return stale_age < Config.Constants.STALE_WHILE_REVALIDATE_SECONDS
+
+
+def _is_unchanged(cached: SheetData | None, modified_time: str | None) -> bool:
+    """Whether cached data was fetched at the given spreadsheet modification time."""
+    return (
+        cached is not None
+        and modified_time is not None
+        and cached.modified_time == modified_time
+    )
+
+
 def _generate_api_name(repo: dynamodb_client.DynamoDBClient) -> str:
     """Generate a random unique name that does not already exist in the repository.
 
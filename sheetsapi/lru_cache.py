@@ -1,45 +1,179 @@
+import collections
 import dataclasses
-from typing import TypeVar
+import sys
+import threading
+import time
+from typing import Any, Callable, Generic, Optional, TypeVar
 
 T = TypeVar("T")
 
 
+def approximate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate the memory footprint of an object in bytes.
+
+    Walks containers and object attributes, counting each object once.
+    This is an estimate for cache budgeting, not an exact measurement.
+
+    Args:
+        obj: Object to measure.
+
+    Returns: Approximate size in bytes.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approximate_size(k, seen) + approximate_size(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approximate_size(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += approximate_size(vars(obj), seen)
+    return size
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+@dataclasses.dataclass
+class _Entry(Generic[T]):
+    value: T
+    size: int
+    expires_at: Optional[float]
+
+
 @dataclasses.dataclass
-class LRUCache:
-    """Simple LRU cache implementation.
+class LRUCache(Generic[T]):
+    """Thread-safe LRU cache with per-entry TTLs and a memory budget.
+
+    All operations are O(1). Entries are evicted least-recently-used first
+    once the approximate size of all entries exceeds `max_bytes`.
 
     Args:
-        capacity: Maximum number of items to store.
+        max_bytes: Maximum approximate size of all entries, in bytes.
+        default_ttl: TTL in seconds for entries put without one. None never expires.
+        size_of: Function used to approximate the size of a value in bytes.
     """
 
-    capacity: int
-    cache: dict = dataclasses.field(default_factory=dict)
-    order: list = dataclasses.field(default_factory=list)
+    max_bytes: int
+    default_ttl: Optional[float] = None
+    size_of: Callable[[Any], int] = approximate_size
+    stats: CacheStats = dataclasses.field(default_factory=CacheStats)
+    cache: collections.OrderedDict = dataclasses.field(
+        default_factory=collections.OrderedDict
+    )
+    current_bytes: int = 0
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False
+    )
 
-    def get(self, key: str) -> T:
+    def get(self, key: str) -> Optional[T]:
         """Get item from cache.
 
         Args:
             key: Key to get.
 
-        Returns: Value if exists, None if missing.
+        Returns: Value if exists and has not expired, None otherwise.
         """
-        if key in self.cache:
-            self.order.remove(key)
-            self.order.append(key)
-            return self.cache[key]
-        return None
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.time():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.stats.hits += 1
+            return entry.value
 
-    def put(self, key: str, value: T) -> None:
+    def put(self, key: str, value: T, ttl: Optional[float] = None) -> None:
         """Add item to cache.
 
+        Items larger than `max_bytes` are not cached.
+
         Args:
             key: Key to add.
             value: Value to add.
+            ttl: Seconds until the item expires. Defaults to `default_ttl`.
+        """
+        ttl = ttl if ttl is not None else self.default_ttl
+        size = self.size_of(value)
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            expires_at = time.time() + ttl if ttl is not None else None
+            self.cache[key] = _Entry(value=value, size=size, expires_at=expires_at)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.cache))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def resize(self, key: str) -> None:
+        """Re-measure an entry whose value grew in place, e.g. a lazily filled cache.
+
+        Other entries are evicted if the cache is now over its budget.
+
+        Args:
+            key: Key of the entry to re-measure.
         """
-        if key in self.cache:
-            self.order.remove(key)
-        elif len(self.cache) >= self.capacity:
-            del self.cache[self.order.pop(0)]
-        self.cache[key] = value
-        self.order.append(key)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return
+            size = self.size_of(entry.value)
+            self.current_bytes += size - entry.size
+            entry.size = size
+            if size > self.max_bytes:
+                self._remove(key)
+                return
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.cache))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Remove item from cache if present.
+
+        Args:
+            key: Key to remove.
+        """
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+
+    def snapshot_stats(self) -> dict:
+        """Get cache counters along with current usage."""
+        with self._lock:
+            return {
+                **dataclasses.asdict(self.stats),
+                "entries": len(self.cache),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def _remove(self, key: str) -> None:
+        entry = self.cache.pop(key)
+        self.current_bytes -= entry.size
@@ -0,0 +1,297 @@
+import base64
+import dataclasses
+import json
+import operator
+import re
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Optional
+
+if TYPE_CHECKING:
+    from sheetsapi.column_index import ColumnIndex
+    from sheetsapi.columnar import ColumnarTable
+
+# Query parameters with a meaning of their own, never treated as column filters
+RESERVED_PARAMS = {
+    "worksheet",
+    "worksheets",
+    "fields",
+    "sort",
+    "limit",
+    "offset",
+    "cursor",
+    "format",
+}
+
+FILTER_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+_FILTER_PARAM_REGEX = re.compile(r"^(?P<column>.+?)\[(?P<op>[a-z]+)\]$")
+
+
+class InvalidQuery(Exception):
+    """Raised when query parameters cannot be parsed into a query."""
+
+
+@dataclasses.dataclass
+class Filter:
+    """Condition on a single column.
+
+    Args:
+        column: Column (header) name.
+        op: Operator name, a key of `FILTER_OPERATORS` or "in".
+        value: Raw value from the query string. For "in", a list of values.
+    """
+
+    column: str
+    op: str
+    value: Any
+
+    def matches(self, cell: Any) -> bool:
+        """Whether a cell value of this filter's column satisfies the filter."""
+        if self.op == "in":
+            return any(cell == coerce(value, cell) for value in self.value)
+        if self.op in ("eq", "ne"):
+            return FILTER_OPERATORS[self.op](cell, coerce(self.value, cell))
+        # Range comparisons only make sense between values of the same kind:
+        # numeric values match numbers and other values match non-empty text
+        cell_key = sort_key(cell)
+        target_key = range_target_key(self.value)
+        if cell_key[0] != target_key[0]:
+            return False
+        return FILTER_OPERATORS[self.op](cell_key, target_key)
+
+
+@dataclasses.dataclass
+class Selection:
+    """Positions of the rows selected by a query, before materialization.
+
+    Args:
+        positions: Positions of the selected page of rows, in output order.
+        total: Number of rows matching the filters, before pagination.
+        next_cursor: Cursor for the next page, or None on the last page.
+    """
+
+    positions: list[int]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+@dataclasses.dataclass
+class RecordQuery:
+    """Filtering, projection, sorting and pagination over worksheet records.
+
+    Args:
+        fields: Columns to include in each record. None includes all.
+        filters: Conditions every returned record must satisfy.
+        sort: Columns to sort by, as (column, descending) pairs.
+        limit: Maximum number of records to return. None returns all.
+        offset: Number of matching records to skip.
+    """
+
+    fields: Optional[list[str]] = None
+    filters: list[Filter] = dataclasses.field(default_factory=list)
+    sort: list[tuple[str, bool]] = dataclasses.field(default_factory=list)
+    limit: Optional[int] = None
+    offset: int = 0
+
+    @classmethod
+    def from_params(cls, params: Iterable[tuple[str, str]]) -> "RecordQuery":
+        """Parse a query from query string parameters.
+
+        Supported parameters:
+            fields=a,b: Only return columns a and b.
+            sort=a,-b: Sort by a ascending, then by b descending.
+            limit=N, offset=N: Return N records, skipping the first N.
+            cursor=...: Continue from a cursor returned by a previous page.
+            <column>=value: Column equals value.
+            <column>[op]=value: Column compared to value, where op is one of
+                eq, ne, gt, gte, lt, lte or in (comma separated values).
+
+        Filters on columns the worksheet does not have are ignored, see
+        `for_table`, so parameters like cache busters (`?_=123`) don't
+        filter out every record.
+
+        Args:
+            params: Query string (key, value) pairs.
+
+        Returns:
+            The parsed query.
+        """
+        query = cls()
+        for key, value in params:
+            if key == "fields":
+                query.fields = [field for field in value.split(",") if field]
+            elif key == "sort":
+                for column in value.split(","):
+                    if column:
+                        query.sort.append((column.lstrip("-"), column.startswith("-")))
+            elif key == "limit":
+                query.limit = _parse_non_negative_int(key, value)
+            elif key == "offset":
+                query.offset = _parse_non_negative_int(key, value)
+            elif key == "cursor":
+                query.offset = decode_cursor(value)
+            elif key in RESERVED_PARAMS:
+                continue
+            else:
+                query.filters.append(_parse_filter(key, value))
+        return query
+
+    def for_table(self, table: "ColumnarTable") -> "RecordQuery":
+        """This query without the filters on columns missing from a table."""
+        filters = [f for f in self.filters if table.has_column(f.column)]
+        if len(filters) == len(self.filters):
+            return self
+        return dataclasses.replace(self, filters=filters)
+
+    def is_empty(self) -> bool:
+        """Whether the query would return the records unchanged."""
+        return (
+            self.fields is None
+            and not self.filters
+            and not self.sort
+            and self.limit is None
+            and self.offset == 0
+        )
+
+    def select(
+        self,
+        table: "ColumnarTable",
+        indexes: Optional[Mapping[str, "ColumnIndex"]] = None,
+    ) -> Selection:
+        """Find the positions of the rows selected by the query.
+
+        Filters on indexed columns narrow down the candidate rows through the
+        index instead of scanning every row. Candidates are still checked
+        against every filter, so indexes never change the result. Filters on
+        columns missing from `table` are ignored.
+
+        Args:
+            table: Worksheet rows to query. They are not modified.
+            indexes: Column indexes over `table`, keyed by column.
+
+        Returns:
+            Positions of the selected page of rows, in output order.
+        """
+        checks = [
+            (condition, table.column(condition.column))
+            for condition in self.for_table(table).filters
+        ]
+
+        positions: Optional[set[int]] = None
+        for condition, _ in checks:
+            index = indexes.get(condition.column) if indexes else None
+            candidates = index.candidates(condition) if index else None
+            if candidates is None:
+                continue
+            positions = candidates if positions is None else positions & candidates
+
+        candidates = range(len(table)) if positions is None else sorted(positions)
+        matched = [
+            position
+            for position in candidates
+            if all(condition.matches(values[position]) for condition, values in checks)
+        ]
+        # Sort by the least significant key first; Python's sort is stable
+        for column, descending in reversed(self.sort):
+            if table.has_column(column):
+                values = table.column(column)
+                matched.sort(key=lambda p: sort_key(values[p]), reverse=descending)
+                if descending:
+                    # Keep empty cells last in either direction
+                    matched = [p for p in matched if not _is_empty(values[p])] + [
+                        p for p in matched if _is_empty(values[p])
+                    ]
+
+        end = None if self.limit is None else self.offset + self.limit
+        next_cursor = None
+        if end is not None and end < len(matched):
+            next_cursor = encode_cursor(end)
+        return Selection(
+            positions=matched[self.offset : end],
+            total=len(matched),
+            next_cursor=next_cursor,
+        )
+
+
+def coerce(value: str, like: Any) -> Any:
+    """Convert a query string value to the type of a cell value.
+
+    Args:
+        value: Raw value from the query string.
+        like: Cell value whose type to match.
+
+    Returns:
+        The converted value, or `value` unchanged if it cannot be converted.
+    """
+    if isinstance(like, bool):
+        return value.lower() in ("true", "1")
+    if isinstance(like, (int, float)):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def sort_key(value: Any) -> tuple:
+    """Sort key ordering numbers before strings and empty cells last."""
+    if _is_empty(value):
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value))
+
+
+def range_target_key(value: str) -> tuple:
+    """Sort key of a query string value used in a range comparison."""
+    try:
+        return sort_key(float(value))
+    except ValueError:
+        return sort_key(value)
+
+
+def encode_cursor(offset: int) -> str:
+    """Encode a pagination offset as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode an opaque cursor into a pagination offset."""
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["o"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidQuery(f"Invalid cursor: {cursor}")
+
+
+def _parse_filter(key: str, value: str) -> Filter:
+    match = _FILTER_PARAM_REGEX.match(key)
+    if match is None:
+        return Filter(column=key, op="eq", value=value)
+
+    op = match.group("op")
+    if op == "in":
+        return Filter(column=match.group("column"), op=op, value=value.split(","))
+    if op not in FILTER_OPERATORS:
+        raise InvalidQuery(f"Unknown filter operator '{op}' in '{key}'")
+    return Filter(column=match.group("column"), op=op, value=value)
+
+
+def _parse_non_negative_int(key: str, value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise InvalidQuery(f"'{key}' must be an integer, got '{value}'")
+    if number < 0:
+        raise InvalidQuery(f"'{key}' must not be negative, got '{value}'")
+    return number
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == ""
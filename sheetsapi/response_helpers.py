@@ -0,0 +1,132 @@
+import gzip
+from typing import Callable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Bodies are compressed once per fill rather than per response, but large
+# worksheets still need to be compressed quickly. Quality 5 is several times
+# faster than the default of 11 for a slightly larger body.
+BROTLI_QUALITY = 5
+
+# Content encodings bodies can be served in, in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body.
+
+    Args:
+        body: Uncompressed body.
+        encoding: Content encoding, "gzip" or "br".
+
+    Returns:
+        The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content encoding accepted by the client.
+
+    Args:
+        accept_encoding: Value of the request's Accept-Encoding header.
+
+    Returns:
+        "br", "gzip" or None for an uncompressed response.
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches a strong ETag.
+
+    Args:
+        if_none_match: Value of the request's If-None-Match header.
+        etag: Unquoted ETag of the current uncompressed body.
+
+    Returns:
+        True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        # Any encoding of the same body is current
+        base, _, encoding = candidate.rpartition("-")
+        if candidate == etag or (base == etag and encoding in ("gzip", "br")):
+            return True
+    return False
+
+
+def cached_response(
+    request: Request,
+    etag: str,
+    body_for_encoding: Callable[[Optional[str]], bytes],
+    media_type: str,
+    headers: Optional[dict] = None,
+    compressible: bool = True,
+) -> Response:
+    """Build a response from pre-serialized bytes, honoring conditional requests.
+
+    Answers with 304 Not Modified if the client already has the current
+    representation, otherwise with the body in the best accepted encoding.
+
+    Args:
+        request: The incoming request.
+        etag: Unquoted strong ETag of the uncompressed body.
+        body_for_encoding: Returns the body for an encoding (None for identity).
+        media_type: Media type of the body.
+        headers: Extra headers, e.g. Cache-Control.
+        compressible: Whether the body benefits from a content encoding.
+
+    Returns:
+        The response.
+    """
+    encoding = None
+    if compressible:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    # Each encoding is a distinct representation, so it gets its own strong ETag
+    representation_etag = etag if encoding is None else f"{etag}-{encoding}"
+    headers = {
+        **(headers or {}),
+        "ETag": f'"{representation_etag}"',
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=body_for_encoding(encoding),
+        media_type=media_type,
+        headers=headers,
+        status_code=200,
+    )
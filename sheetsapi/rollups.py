@@ -0,0 +1,107 @@
+import collections
+import dataclasses
+import datetime
+from typing import Iterable, Iterator
+
+# Length of the ISO timestamp prefix naming each bucket, e.g. "2024-05-01T10"
+# for hours
+GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}
+
+BUCKET_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Granularity with a single bucket, counting every invocation ingested
+TOTAL = "total"
+TOTAL_BUCKET = "all"
+
+# Counter attribute summing every status class
+TOTAL_COUNT = "total"
+
+# Set on the total rollup once invocations logged before rollups existed have
+# been counted into it
+BACKFILLED = "backfilled"
+
+
+def partition_key(api: str, granularity: str) -> str:
+    """Analytics table partition key of an API's rollups at a granularity.
+
+    "#" never appears in request paths, so these cannot clash with the
+    partition keys of raw log items.
+    """
+    return f"{api}#{granularity}"
+
+
+def ingestion_marker_key(log_object: str, partition: str, bucket: str) -> dict:
+    """Key of the item recording that a log object was counted into a rollup.
+
+    Partition keys starting with "#" belong to no API, so these cannot clash
+    with raw log items or rollups.
+    """
+    return {"path": f"#ingested#{log_object}", "timestamp": f"{partition}|{bucket}"}
+
+
+def bucket(timestamp: str, granularity: str) -> str:
+    """The bucket of an ISO timestamp at a granularity, e.g. "2024-05-01T10"."""
+    if granularity == TOTAL:
+        return TOTAL_BUCKET
+    return timestamp[: GRANULARITIES[granularity]]
+
+
+def bucket_count(
+    start: datetime.datetime, end: datetime.datetime, granularity: str
+) -> int:
+    """Number of buckets between two times, inclusive."""
+    return int((end - start).total_seconds() // BUCKET_SECONDS[granularity]) + 1
+
+
+def status_class(status_code: int) -> str:
+    """E.g. "4xx" for 404."""
+    return f"{status_code // 100}xx"
+
+
+@dataclasses.dataclass
+class RollupCounter:
+    """Invocation counts aggregated in memory, to be added to stored rollups.
+
+    Requests are counted per API, minute and status class; coarser buckets
+    are derived from those when the counts are written.
+    """
+
+    _counts: collections.Counter = dataclasses.field(
+        default_factory=collections.Counter
+    )
+
+    def add(self, api: str, timestamp: str, status_code: int) -> None:
+        """Count a request.
+
+        Args:
+            api: The API path, after /api/.
+            timestamp: ISO timestamp of the request.
+            status_code: HTTP status code of the response.
+        """
+        minute = bucket(timestamp, "minute")
+        self._counts[(api, minute, status_class(status_code))] += 1
+
+    def count(
+        self, requests: Iterable[tuple[str, str, int]]
+    ) -> Iterator[tuple[str, str, int]]:
+        """Count (api, timestamp, status code) requests as they pass through."""
+        for request in requests:
+            self.add(*request)
+            yield request
+
+    def increments(self) -> dict[tuple[str, str], dict[str, int]]:
+        """Amounts to add to each stored rollup.
+
+        Returns:
+            Counter increments by status class, and in total, keyed by the
+            partition key and bucket of the rollup.
+        """
+        increments = collections.defaultdict(collections.Counter)
+        for (api, minute, status), count in self._counts.items():
+            for granularity in (*GRANULARITIES, TOTAL):
+                amounts = increments[
+                    (partition_key(api, granularity), bucket(minute, granularity))
+                ]
+                amounts[status] += count
+                amounts[TOTAL_COUNT] += count
+        return {key: dict(amounts) for key, amounts in increments.items()}
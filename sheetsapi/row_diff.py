@@ -0,0 +1,186 @@
+import dataclasses
+from typing import Any, Iterable, Optional
+
+from sheetsapi import columnar
+
+# Header row plus 1-based numbering, so keys match the rows shown in Sheets
+_FIRST_ROW_NUMBER = 2
+
+
+@dataclasses.dataclass
+class RowChanges:
+    """Row-level changes between two versions of a worksheet.
+
+    Rows are identified by the value of a key column, or by their row number
+    in the worksheet if there is no usable key column.
+
+    Args:
+        since: Version the changes apply to.
+        version: Version the changes lead to.
+        key_column: Column identifying rows, or None for row numbers.
+        added: Rows that did not exist before, by key.
+        changed: New contents of rows whose values changed, by key.
+        removed: Keys of rows that no longer exist.
+    """
+
+    since: int
+    version: int
+    key_column: Optional[str]
+    added: dict[Any, dict] = dataclasses.field(default_factory=dict)
+    changed: dict[Any, dict] = dataclasses.field(default_factory=dict)
+    removed: list = dataclasses.field(default_factory=list)
+
+    def size(self) -> int:
+        """Number of rows affected."""
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def to_dict(self) -> dict:
+        """Serialize the changes for a JSON response."""
+        return {
+            "since": self.since,
+            "version": self.version,
+            "key": self.key_column or "row",
+            "added": [{"key": k, "row": row} for k, row in self.added.items()],
+            "changed": [{"key": k, "row": row} for k, row in self.changed.items()],
+            "removed": self.removed,
+        }
+
+    def to_snapshot(self) -> dict:
+        """Serialize the changes as plain JSON-compatible values.
+
+        Unlike `to_dict`, keys are kept as (key, row) pairs, since keys may be
+        numbers and JSON object keys are always strings.
+        """
+        return {
+            "since": self.since,
+            "version": self.version,
+            "key_column": self.key_column,
+            "added": list(self.added.items()),
+            "changed": list(self.changed.items()),
+            "removed": self.removed,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "RowChanges":
+        """Rebuild changes serialized by `to_snapshot`."""
+        return cls(
+            since=snapshot["since"],
+            version=snapshot["version"],
+            key_column=snapshot["key_column"],
+            added=dict(snapshot["added"]),
+            changed=dict(snapshot["changed"]),
+            removed=snapshot["removed"],
+        )
+
+
+def key_column_for(
+    table: columnar.ColumnarTable, candidates: Iterable[str]
+) -> Optional[str]:
+    """Pick the first candidate column whose values identify rows uniquely.
+
+    Args:
+        table: Worksheet rows.
+        candidates: Columns to consider, in order of preference.
+
+    Returns:
+        The key column, or None to identify rows by row number.
+    """
+    for column in candidates:
+        if not table.has_column(column):
+            continue
+        values = table.column(column)
+        if len(set(values)) == len(values) and all(v not in ("", None) for v in values):
+            return column
+    return None
+
+
+def diff(
+    old: columnar.ColumnarTable,
+    new: columnar.ColumnarTable,
+    since: int,
+    version: int,
+    key_column: Optional[str] = None,
+) -> RowChanges:
+    """Compute the row-level changes between two versions of a worksheet.
+
+    Args:
+        old: Rows of the previous version.
+        new: Rows of the new version.
+        since: Version of `old`.
+        version: Version of `new`.
+        key_column: Column identifying rows in both versions, or None to
+            identify rows by row number.
+
+    Returns:
+        The changes.
+    """
+    changes = RowChanges(since=since, version=version, key_column=key_column)
+    old_keys = _row_keys(old, key_column)
+    new_keys = _row_keys(new, key_column)
+    old_positions = {key: position for position, key in enumerate(old_keys)}
+    # Rows can be compared as tuples unless the columns changed
+    same_headers = old.headers == new.headers
+    old_tuples = list(old.tuples()) if same_headers else None
+
+    new_tuples = new.tuples()
+    for position, key in enumerate(new_keys):
+        values = next(new_tuples)
+        old_position = old_positions.pop(key, None)
+        if old_position is None:
+            changes.added[key] = new.row(position)
+        elif same_headers:
+            if old_tuples[old_position] != values:
+                changes.changed[key] = new.row(position)
+        elif old.row(old_position) != new.row(position):
+            changes.changed[key] = new.row(position)
+    changes.removed = list(old_positions)
+    return changes
+
+
+def compose(history: list[RowChanges], since: int) -> Optional[RowChanges]:
+    """Combine consecutive changes into the changes since a version.
+
+    Args:
+        history: Changes between consecutive versions, oldest first.
+        since: Version to get the changes since.
+
+    Returns:
+        The combined changes, or None if they cannot be computed from the
+        history, e.g. because `since` is too old or unknown.
+    """
+    start = next((i for i, c in enumerate(history) if c.since == since), None)
+    if start is None:
+        return None
+    steps = history[start:]
+    key_column = steps[0].key_column
+    if any(step.key_column != key_column for step in steps):
+        return None
+
+    combined = RowChanges(since=since, version=steps[-1].version, key_column=key_column)
+    # Keys removed since `since`, as an ordered set
+    removed: dict = {}
+    for step in steps:
+        for key, row in step.added.items():
+            if key in removed:
+                # Removed and added back is a change to the original row
+                del removed[key]
+                combined.changed[key] = row
+            else:
+                combined.added[key] = row
+        for key, row in step.changed.items():
+            if key in combined.added:
+                combined.added[key] = row
+            else:
+                combined.changed[key] = row
+        for key in step.removed:
+            combined.changed.pop(key, None)
+            if combined.added.pop(key, None) is None:
+                removed[key] = None
+    combined.removed = list(removed)
+    return combined
+
+
+def _row_keys(table: columnar.ColumnarTable, key_column: Optional[str]) -> list:
+    if key_column is not None and table.has_column(key_column):
+        return list(table.column(key_column))
+    return list(range(_FIRST_ROW_NUMBER, len(table) + _FIRST_ROW_NUMBER))
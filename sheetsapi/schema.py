@@ -0,0 +1,131 @@
+import array
+import dataclasses
+import datetime
+from typing import Any, Optional, Sequence
+
+from sheetsapi import columnar
+
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+DATE = "date"
+STRING = "string"
+
+# Date formats normalized to ISO 8601. Only year-first formats are accepted:
+# whether 01/02/2024 is in January or February depends on the spreadsheet's
+# locale, so columns of such dates are left as strings.
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+
+BOOL_VALUES = {"true": True, "false": False}
+
+
+@dataclasses.dataclass(frozen=True)
+class ColumnSchema:
+    """Inferred type of a worksheet column.
+
+    Args:
+        name: Column (header) name.
+        type: One of int, float, bool, date or string.
+        nullable: Whether any cell in the column is empty.
+    """
+
+    name: str
+    type: str
+    nullable: bool
+
+
+def infer_type(values: Sequence) -> str:
+    """Infer the type of a column from its values.
+
+    Empty cells are ignored. A column is only given a type other than string
+    if every non-empty cell has that type.
+
+    Args:
+        values: The column's values, as parsed from the worksheet.
+
+    Returns:
+        The column type.
+    """
+    if isinstance(values, array.array):
+        return INT if values.typecode == "q" else FLOAT
+
+    present = [value for value in values if not _is_empty(value)]
+    if not present:
+        return STRING
+    if all(type(value) is int for value in present):
+        return INT
+    if all(type(value) in (int, float) for value in present):
+        return FLOAT
+    if all(isinstance(value, str) for value in present):
+        if all(value.lower() in BOOL_VALUES for value in present):
+            return BOOL
+        if all(_parse_date(value) is not None for value in present):
+            return DATE
+    return STRING
+
+
+def apply_schema(
+    table: columnar.ColumnarTable,
+) -> tuple[columnar.ColumnarTable, list[ColumnSchema]]:
+    """Infer column types and convert every cell to its column's type.
+
+    Empty cells become None in typed columns. Dates are normalized to ISO
+    8601 strings. Fully populated int and float columns end up in typed
+    arrays. String columns keep their cells as parsed, so a column mixing
+    numbers and text still serves the numbers as numbers.
+
+    Args:
+        table: Worksheet rows as parsed from the values API.
+
+    Returns:
+        The typed table and its schema.
+    """
+    column_schema = []
+    columns = []
+    for name, values in zip(table.headers, table.columns):
+        column_type = infer_type(values)
+        converted = [_convert(value, column_type) for value in values]
+        column_schema.append(
+            ColumnSchema(
+                name=name,
+                type=column_type,
+                nullable=any(value is None for value in converted),
+            )
+        )
+        columns.append(columnar.compact_column(converted))
+
+    typed = columnar.ColumnarTable(
+        headers=table.headers,
+        columns=columns,
+        column_types=tuple(column.type for column in column_schema),
+    )
+    return typed, column_schema
+
+
+def _convert(value: Any, column_type: str) -> Any:
+    if column_type == STRING:
+        return value
+    if _is_empty(value):
+        return None
+    if column_type == INT:
+        return int(value)
+    if column_type == FLOAT:
+        return float(value)
+    if column_type == BOOL:
+        return BOOL_VALUES[value.lower()]
+    if column_type == DATE:
+        return _parse_date(value).isoformat()
+    raise ValueError(f"Unknown column type: {column_type}")
+
+
+def _parse_date(value: str) -> Optional[datetime.date]:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == ""
@@ -0,0 +1,280 @@
+import abc
+import dataclasses
+import json
+import logging
+import secrets
+import struct
+import threading
+import time
+from typing import Any, Optional
+
+from sheetsapi import lru_cache
+
+try:
+    import redis
+except ImportError:  # redis is only needed for the redis cache backend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Entry layout: header, JSON metadata, then the raw payload. Metadata is JSON
+# rather than pickle, so write access to the cache does not allow running code.
+_MAGIC = b"SAPI3"
+# magic, expiry and fresh until (unix times), metadata length
+_HEADER = struct.Struct("<5sddQ")
+HEADER_SIZE = _HEADER.size
+
+
+@dataclasses.dataclass
+class CacheEntryHeader:
+    """The fixed-size header of an entry, readable without decoding the rest.
+
+    Args:
+        expires_at: Unix time after which the entry is no longer served.
+        fresh_until: Unix time until which the entry is fresh, as given to
+            `put`. Lets processes waiting for a fill notice it cheaply.
+    """
+
+    expires_at: float
+    fresh_until: float
+
+    def is_fresh(self) -> bool:
+        """Whether the entry is still within its freshness lifetime."""
+        return self.fresh_until > time.time()
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """An entry read from a shared cache.
+
+    Args:
+        metadata: The decoded JSON metadata.
+        payload: The raw payload, without copying it out of the read buffer.
+        expires_at: Unix time after which the entry is no longer served.
+        fresh_until: Unix time until which the entry is fresh.
+    """
+
+    metadata: Any
+    payload: memoryview
+    expires_at: float
+    fresh_until: float = 0.0
+
+    def ttl(self) -> float:
+        """Seconds until the entry expires."""
+        return self.expires_at - time.time()
+
+
+def encode_entry(
+    metadata: Any, payload: bytes, ttl: float, fresh_until: float = 0.0
+) -> list[bytes]:
+    """Serialize an entry, returned as chunks to avoid copying the payload.
+
+    Args:
+        metadata: JSON-serializable object stored alongside the payload.
+        payload: Raw bytes.
+        ttl: Seconds until the entry expires.
+        fresh_until: Unix time until which the entry is fresh.
+
+    Returns:
+        The header, JSON metadata and payload, to be written in order.
+    """
+    encoded = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+    header = _HEADER.pack(_MAGIC, time.time() + ttl, fresh_until, len(encoded))
+    return [header, encoded, payload]
+
+
+def decode_header(buffer) -> Optional[CacheEntryHeader]:
+    """Deserialize the header of an entry written by `encode_entry`.
+
+    Args:
+        buffer: At least the first `HEADER_SIZE` bytes of the serialized
+            entry, any object supporting the buffer protocol.
+
+    Returns:
+        The header, or None if the entry has expired.
+    """
+    magic, expires_at, fresh_until, _ = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("Unexpected cache entry format")
+    if expires_at <= time.time():
+        return None
+    return CacheEntryHeader(expires_at=expires_at, fresh_until=fresh_until)
+
+
+def decode_entry(buffer) -> Optional[CacheEntry]:
+    """Deserialize an entry written by `encode_entry`.
+
+    Args:
+        buffer: The serialized entry, any object supporting the buffer protocol.
+
+    Returns:
+        The entry, or None if it has expired.
+    """
+    magic, expires_at, fresh_until, metadata_length = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError("Unexpected cache entry format")
+    if expires_at <= time.time():
+        return None
+    view = memoryview(buffer)
+    metadata_end = _HEADER.size + metadata_length
+    return CacheEntry(
+        metadata=json.loads(bytes(view[_HEADER.size : metadata_end])),
+        payload=view[metadata_end:],
+        expires_at=expires_at,
+        fresh_until=fresh_until,
+    )
+
+
+class SharedCache(abc.ABC):
+    """A cache tier shared by every process serving the API.
+
+    Besides entries, backends provide locks so that only one process at a
+    time fills a given key from upstream.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Read an entry, or None if it is missing, expired or unreadable."""
+
+    @abc.abstractmethod
+    def peek(self, key: str) -> Optional[CacheEntryHeader]:
+        """Read only the header of an entry, or None if it is missing,
+        expired or unreadable. Much cheaper than `get` for large entries."""
+
+    @abc.abstractmethod
+    def put(
+        self,
+        key: str,
+        metadata: Any,
+        payload: bytes,
+        ttl: float,
+        fresh_until: float = 0.0,
+    ) -> None:
+        """Write an entry, replacing any previous one.
+
+        Args:
+            key: Cache key.
+            metadata: JSON-serializable object stored alongside the payload.
+            payload: Raw bytes, returned without copying by `get` if possible.
+            ttl: Seconds until the entry expires.
+            fresh_until: Unix time until which the entry is fresh, returned by
+                `peek` without reading the rest of the entry.
+        """
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an entry, if present."""
+
+    @abc.abstractmethod
+    def try_lock(self, key: str, ttl: float) -> Optional[Any]:
+        """Try to take the fill lock of a key, without waiting.
+
+        Args:
+            key: Cache key.
+            ttl: Seconds after which the lock is released even if its holder
+                never releases it, e.g. because it crashed.
+
+        Returns:
+            A token to pass to `unlock`, or None if the lock is held elsewhere.
+        """
+
+    @abc.abstractmethod
+    def unlock(self, key: str, token: Any) -> None:
+        """Release a fill lock taken with `try_lock`."""
+
+    @abc.abstractmethod
+    def snapshot_stats(self) -> dict:
+        """Get cache counters along with current usage."""
+
+
+@dataclasses.dataclass
+class RedisCache(SharedCache):
+    """Cache tier in Redis, or any server speaking the Redis protocol.
+
+    Entries expire through Redis TTLs. Fill locks are keys set with NX and a
+    TTL, so a crashed holder cannot block fills for longer than the TTL.
+
+    Args:
+        client: A redis-py client.
+        prefix: Prefix of every key written, to share a server with others.
+    """
+
+    client: Any
+    prefix: str = "sheets-api:"
+    stats: lru_cache.CacheStats = dataclasses.field(
+        default_factory=lru_cache.CacheStats
+    )
+    _lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False
+    )
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCache":
+        """Connect to a Redis server by URL, e.g. redis://localhost:6379/0."""
+        if redis is None:
+            raise ImportError("redis is required for the redis cache backend.")
+        return cls(client=redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            value = self.client.get(self.prefix + key)
+            entry = None if value is None else decode_entry(value)
+        except Exception:
+            logger.exception(f"Failed to read {key} from Redis")
+            entry = None
+        self._count("hits" if entry is not None else "misses")
+        return entry
+
+    def peek(self, key: str) -> Optional[CacheEntryHeader]:
+        try:
+            value = self.client.getrange(self.prefix + key, 0, HEADER_SIZE - 1)
+            return decode_header(value) if len(value) == HEADER_SIZE else None
+        except Exception:
+            logger.exception(f"Failed to read the header of {key} from Redis")
+            return None
+
+    def put(
+        self,
+        key: str,
+        metadata: Any,
+        payload: bytes,
+        ttl: float,
+        fresh_until: float = 0.0,
+    ) -> None:
+        value = b"".join(encode_entry(metadata, payload, ttl, fresh_until))
+        self.client.set(self.prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def try_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = secrets.token_hex(16)
+        acquired = self.client.set(
+            f"{self.prefix}lock:{key}", token, nx=True, px=max(int(ttl * 1000), 1)
+        )
+        return token if acquired else None
+
+    def unlock(self, key: str, token: str) -> None:
+        lock_key = f"{self.prefix}lock:{key}"
+        # Only delete the lock if it is still ours; it may have expired and
+        # been taken by another process meanwhile
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(lock_key)
+                current = pipe.get(lock_key)
+                if current is not None and current.decode() == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+            except redis.WatchError:
+                pass  # Changed hands while releasing, so no longer ours
+
+    def snapshot_stats(self) -> dict:
+        with self._lock:
+            return dataclasses.asdict(self.stats)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            setattr(self.stats, stat, getattr(self.stats, stat) + 1)
@@ -0,0 +1,245 @@
+import asyncio
+import dataclasses
+import datetime
+import logging
+import urllib.parse
+
+import gspread
+import httpx
+from google.oauth2.credentials import Credentials
+
+from sheetsapi import lru_cache, single_flight
+
+logger = logging.getLogger(__name__)
+
+SHEETS_API_BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+DRIVE_FILES_API_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+class SheetsAPIError(Exception):
+    """Raised when the Google Sheets API returns an unexpected error."""
+
+
+def _raise_for_status(response: httpx.Response, worksheet_name: str) -> None:
+    """Raise an error for unsuccessful values API responses.
+
+    The API reports a missing worksheet as an unparseable range, which is
+    mapped to gspread's `WorksheetNotFound` to match the sync code path.
+    """
+    if response.status_code == 400 and "Unable to parse range" in response.text:
+        raise gspread.exceptions.WorksheetNotFound(worksheet_name)
+    if response.is_error:
+        raise SheetsAPIError(
+            f"Sheets API returned {response.status_code}: {response.text}"
+        )
+
+
+@dataclasses.dataclass
+class AsyncSheetsValuesClient:
+    """Async client for the Google Sheets values API.
+
+    A single pooled `httpx.AsyncClient` is shared by all requests so
+    connections to Google are kept alive between fetches. Credentials are
+    expected to come from a `CredentialPool`, so tokens refreshed here are
+    shared with every other request using the same refresh token.
+
+    Args:
+        max_connections: Maximum number of concurrent connections to Google.
+        timeout: Request timeout in seconds.
+        drive_denied_ttl: Seconds to remember that credentials were denied
+            access to Drive metadata, skipping the request meanwhile.
+    """
+
+    max_connections: int = 100
+    timeout: float = 30.0
+    drive_denied_ttl: float = 24 * 60 * 60
+    _http: httpx.AsyncClient | None = dataclasses.field(default=None, repr=False)
+    _refreshes: single_flight.AsyncSingleFlight = dataclasses.field(
+        default_factory=single_flight.AsyncSingleFlight, repr=False
+    )
+    # Refresh tokens whose grant lacks the Drive metadata scope
+    _drive_denied: lru_cache.LRUCache = dataclasses.field(
+        default_factory=lambda: lru_cache.LRUCache(1024 * 1024), repr=False
+    )
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def get_values(
+        self,
+        credentials: Credentials,
+        spreadsheet_id: str,
+        worksheet_name: str,
+    ) -> list[list]:
+        """Fetch all values of a worksheet.
+
+        If the access token has expired it is refreshed and the request
+        retried once.
+
+        Args:
+            credentials: Credentials of the spreadsheet owner.
+            spreadsheet_id: The ID of the Google Sheet.
+            worksheet_name: The name of the sheet within the Google Sheet.
+
+        Returns:
+            Rows of cell values.
+        """
+        range_name = urllib.parse.quote(
+            gspread.utils.absolute_range_name(worksheet_name), safe=""
+        )
+        url = f"{SHEETS_API_BASE_URL}/{spreadsheet_id}/values/{range_name}"
+
+        response = await self._authorized_get(credentials, url)
+        _raise_for_status(response, worksheet_name)
+        # Values responses can be many megabytes, so parse them off the event loop
+        body = await asyncio.to_thread(response.json)
+        return body.get("values", [])
+
+    async def batch_get_values(
+        self,
+        credentials: Credentials,
+        spreadsheet_id: str,
+        worksheet_names: list[str],
+    ) -> dict[str, list[list]]:
+        """Fetch all values of several worksheets in a single request.
+
+        Args:
+            credentials: Credentials of the spreadsheet owner.
+            spreadsheet_id: The ID of the Google Sheet.
+            worksheet_names: The names of the sheets within the Google Sheet.
+
+        Returns:
+            Rows of cell values, keyed by worksheet name.
+        """
+        ranges = [gspread.utils.absolute_range_name(name) for name in worksheet_names]
+        query = urllib.parse.urlencode([("ranges", r) for r in ranges])
+        url = f"{SHEETS_API_BASE_URL}/{spreadsheet_id}/values:batchGet?{query}"
+
+        response = await self._authorized_get(credentials, url)
+        _raise_for_status(response, ", ".join(worksheet_names))
+        body = await asyncio.to_thread(response.json)
+        # Value ranges are returned in the order they were requested
+        value_ranges = body.get("valueRanges", [])
+        return {
+            name: value_range.get("values", [])
+            for name, value_range in zip(worksheet_names, value_ranges)
+        }
+
+    async def get_worksheet_titles(
+        self, credentials: Credentials, spreadsheet_id: str
+    ) -> list[str]:
+        """Fetch the titles of all worksheets in a spreadsheet.
+
+        Args:
+            credentials: Credentials of the spreadsheet owner.
+            spreadsheet_id: The ID of the Google Sheet.
+
+        Returns:
+            Worksheet titles, in tab order.
+        """
+        url = f"{SHEETS_API_BASE_URL}/{spreadsheet_id}?fields=sheets.properties.title"
+        response = await self._authorized_get(credentials, url)
+        _raise_for_status(response, "")
+        return [
+            sheet["properties"]["title"] for sheet in response.json().get("sheets", [])
+        ]
+
+    async def get_modified_time(
+        self, credentials: Credentials, spreadsheet_id: str
+    ) -> str | None:
+        """Fetch the time a spreadsheet was last modified, from Drive metadata.
+
+        This is much cheaper than fetching values, so it is used to check
+        whether cached values are still current.
+
+        Credentials granted before the Drive metadata scope was requested get
+        a 403. That is remembered for `drive_denied_ttl`, so they don't pay
+        for a failing request on every refresh.
+
+        Args:
+            credentials: Credentials of the spreadsheet owner.
+            spreadsheet_id: The ID of the Google Sheet.
+
+        Returns:
+            The RFC 3339 modification time, or None if the credentials were
+            not granted access to Drive metadata.
+        """
+        query = urllib.parse.urlencode(
+            {"fields": "modifiedTime", "supportsAllDrives": "true"}
+        )
+        url = f"{DRIVE_FILES_API_URL}/{spreadsheet_id}?{query}"
+        if self._drive_denied.get(credentials.refresh_token):
+            return None
+        response = await self._authorized_get(credentials, url)
+        if response.status_code == 403:
+            self._drive_denied.put(
+                credentials.refresh_token, True, ttl=self.drive_denied_ttl
+            )
+            return None
+        _raise_for_status(response, "")
+        return response.json().get("modifiedTime")
+
+    async def _authorized_get(
+        self, credentials: Credentials, url: str
+    ) -> httpx.Response:
+        if credentials.token is None or credentials.expired:
+            await self.refresh_access_token(credentials)
+
+        response = await self.http.get(
+            url, headers={"Authorization": f"Bearer {credentials.token}"}
+        )
+        if response.status_code != 401:
+            return response
+
+        await self.refresh_access_token(credentials)
+        return await self.http.get(
+            url, headers={"Authorization": f"Bearer {credentials.token}"}
+        )
+
+    async def refresh_access_token(self, credentials: Credentials) -> None:
+        """Exchange the refresh token for a new access token, in place.
+
+        Concurrent refreshes of the same credentials share one token request.
+
+        Args:
+            credentials: Credentials to refresh.
+        """
+        await self._refreshes.do(
+            credentials.refresh_token, lambda: self._refresh(credentials)
+        )
+
+    async def _refresh(self, credentials: Credentials) -> None:
+        response = await self.http.post(
+            credentials.token_uri,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": credentials.refresh_token,
+                "client_id": credentials.client_id,
+                "client_secret": credentials.client_secret,
+            },
+        )
+        if response.is_error:
+            raise SheetsAPIError(
+                f"Failed to refresh access token ({response.status_code}): {response.text}"
+            )
+        body = response.json()
+        credentials.token = body["access_token"]
+        # google-auth compares expiry against naive UTC datetimes
+        credentials.expiry = datetime.datetime.utcnow() + datetime.timedelta(
+            seconds=body.get("expires_in", 3600)
+        )
@@ -0,0 +1,38 @@
+import asyncio
+import dataclasses
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class AsyncSingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution.
+
+    The first caller for a key starts the work; callers that arrive while it
+    is in flight await and share its result (or exception). The work runs in
+    its own task, so a cancelled caller does not cancel it for the callers
+    still waiting on it.
+    """
+
+    _calls: dict = dataclasses.field(default_factory=dict)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key: Key identifying the work.
+            fn: Coroutine function to run.
+
+        Returns: The result of `fn`.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
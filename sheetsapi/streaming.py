@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from typing import Iterator, Optional, Sequence
+
+from sheetsapi import columnar
+
+# Rows serialized per chunk; larger chunks mean fewer, bigger writes
+ROWS_PER_CHUNK = 500
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def negotiate_format(format_param: Optional[str], accept: Optional[str]) -> str:
+    """Pick the output format from the `format` parameter or Accept header.
+
+    Args:
+        format_param: Value of the `format` query parameter, if given.
+        accept: Value of the request's Accept header.
+
+    Returns:
+        The format name, "json" by default.
+    """
+    if format_param:
+        return format_param.lower()
+    accept = (accept or "").lower()
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    if "text/csv" in accept:
+        return "csv"
+    return "json"
+
+
+def ndjson_stream(
+    table: columnar.ColumnarTable,
+    positions: Optional[Sequence[int]] = None,
+    fields: Optional[list[str]] = None,
+) -> Iterator[bytes]:
+    """Stream rows as newline-delimited JSON objects.
+
+    Args:
+        table: Worksheet rows.
+        positions: Row positions to include, in output order. None includes all.
+        fields: Columns to include. None includes all.
+
+    Yields:
+        Chunks of NDJSON-encoded rows.
+    """
+    lines = []
+    for row in table.rows(positions, fields):
+        lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def csv_stream(
+    table: columnar.ColumnarTable,
+    positions: Optional[Sequence[int]] = None,
+    fields: Optional[list[str]] = None,
+) -> Iterator[bytes]:
+    """Stream rows as CSV, starting with a header row.
+
+    Args:
+        table: Worksheet rows.
+        positions: Row positions to include, in output order. None includes all.
+        fields: Columns to include. None includes all.
+
+    Yields:
+        Chunks of CSV-encoded rows.
+    """
+    if fields is not None:
+        fields = [field for field in fields if table.has_column(field)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.headers if fields is None else fields)
+    for i, row in enumerate(table.tuples(positions, fields), start=1):
+        writer.writerow([_csv_cell(value) for value in row])
+        if i % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _csv_cell(value):
+    # Write booleans the way Google Sheets displays them
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return value
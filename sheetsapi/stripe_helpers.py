@@ -9,7 +9,7 @@ WEBHOOK_SECRET = Config.Constants.STRIPE_WEBHOOK_SECRET
 
 def upgrade_user(email: str, google_sheets_client: google_sheets.GoogleSheets) -> None:
     """Mark a user as a premium user"""
-    repo = dynamodb_client.DynamoDBClient()
+    repo = dynamodb_client.default_client()
 
     # mark as premium user
     repo.update_item(
@@ -39,7 +39,7 @@ def downgrade_user(
             f"Cannot cancel subscription with no email. Customer ID: {customer_id}"
         )
 
-    repo = dynamodb_client.DynamoDBClient()
+    repo = dynamodb_client.default_client()
 
     # downgrade user
     repo.update_item(
@@ -0,0 +1,190 @@
+import asyncio
+import dataclasses
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+import gspread
+
+from sheetsapi import google_sheets
+
+logger = logging.getLogger(__name__)
+
+# Comment lines sent to idle connections so proxies don't time them out
+HEARTBEAT_SECONDS = 15.0
+
+# Shortest wait between two upstream polls of the same worksheet
+MIN_POLL_SECONDS = 1.0
+
+# Longest wait between retries of a worksheet that keeps failing to refresh;
+# retries back off exponentially from `MIN_POLL_SECONDS` up to this
+MAX_RETRY_SECONDS = 300.0
+
+
+@dataclasses.dataclass
+class _Topic:
+    """Subscribers of one worksheet and the latest data sent to them."""
+
+    latest: google_sheets.SheetData
+    subscribers: set[asyncio.Queue] = dataclasses.field(default_factory=set)
+    refresher: Optional[asyncio.Task] = None
+    # Rendered events by the version clients have, shared by all subscribers
+    _events: dict[Optional[int], bytes] = dataclasses.field(default_factory=dict)
+
+    def update(self, data: google_sheets.SheetData) -> None:
+        """Record refreshed data, notifying subscribers if its version changed."""
+        changed = data.version != self.latest.version
+        self.latest = data
+        if not changed:
+            return
+        self._events = {}
+        for queue in self.subscribers:
+            _put_latest(queue, data)
+
+    def close(self, reason: str) -> None:
+        """Tell every subscriber that no further updates will be sent."""
+        for queue in self.subscribers:
+            _put_latest(queue, reason)
+
+    def event_since(self, since: Optional[int]) -> bytes:
+        """The SSE event bringing a client at version `since` up to date."""
+        if since not in self._events:
+            self._events[since] = _render_update(self.latest, since)
+        return self._events[since]
+
+
+@dataclasses.dataclass
+class SubscriptionHub:
+    """Fans worksheet updates out to Server-Sent Events subscribers.
+
+    Each subscribed worksheet has a single background task polling it through
+    the `GoogleSheets` cache once per `cdn_ttl`, however many clients are
+    connected. Clients only receive the rows that changed since the version
+    they have.
+
+    Streams stay open indefinitely, so this is meant for the long-running
+    uvicorn deployment rather than Lambda, and is only served when
+    `SUBSCRIPTIONS_ENABLED` is set.
+
+    Args:
+        sheets: Source of worksheet data.
+    """
+
+    sheets: google_sheets.GoogleSheets
+    _topics: dict[tuple[str, str], _Topic] = dataclasses.field(default_factory=dict)
+
+    async def stream(
+        self,
+        name: str,
+        worksheet_name: str,
+        data: google_sheets.SheetData,
+        since: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        """Stream updates of a worksheet as Server-Sent Events.
+
+        The first event brings the client up to date: a `changes` event if
+        the changes since `since` are known, otherwise a `snapshot` with every
+        row. Later updates are sent the same way. An `error` event is sent
+        if the worksheet can no longer be served, and the stream ends.
+
+        Args:
+            name: The name of the sheet in the repository.
+            worksheet_name: The name of the sheet within the Google Sheet.
+            data: The current worksheet data.
+            since: Version the client already has, if any.
+
+        Yields:
+            Encoded SSE events.
+        """
+        key = (name, worksheet_name)
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = _Topic(latest=data)
+        elif data.fetched_at > topic.latest.fetched_at:
+            topic.update(data)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        topic.subscribers.add(queue)
+        if topic.refresher is None:
+            topic.refresher = asyncio.create_task(self._refresh(key, topic))
+        try:
+            version = since
+            if version != topic.latest.version:
+                yield topic.event_since(version)
+                version = topic.latest.version
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if isinstance(item, str):
+                    yield _render_event("error", None, {"detail": item})
+                    return
+                if topic.latest.version != version:
+                    yield topic.event_since(version)
+                    version = topic.latest.version
+        finally:
+            topic.subscribers.discard(queue)
+            if not topic.subscribers and self._topics.get(key) is topic:
+                topic.refresher.cancel()
+                del self._topics[key]
+
+    async def _refresh(self, key: tuple[str, str], topic: _Topic) -> None:
+        """Poll a worksheet for as long as it has subscribers."""
+        name, worksheet_name = key
+        failures = 0
+        while True:
+            latest = topic.latest
+            delay = max(latest.cdn_ttl - latest.age(), MIN_POLL_SECONDS)
+            if failures:
+                retry_delay = MIN_POLL_SECONDS * 2**failures
+                delay = max(delay, min(retry_delay, MAX_RETRY_SECONDS))
+            await asyncio.sleep(delay)
+            try:
+                data = await self.sheets.refresh_sheet_data_async(name, worksheet_name)
+            except (
+                google_sheets.SheetNotFound,
+                gspread.exceptions.WorksheetNotFound,
+            ):
+                self._close(key, topic, "Worksheet not found.")
+                return
+            except Exception:
+                logger.exception(f"Failed to refresh {name}/{worksheet_name}")
+                failures += 1
+                continue
+            failures = 0
+            if data.frozen:
+                self._close(key, topic, "API is frozen. Upgrade to premium to unfreeze")
+                return
+            topic.update(data)
+
+    def _close(self, key: tuple[str, str], topic: _Topic, reason: str) -> None:
+        # New subscribers get a fresh topic rather than this finished one
+        if self._topics.get(key) is topic:
+            del self._topics[key]
+        topic.close(reason)
+
+
+def _render_update(data: google_sheets.SheetData, since: Optional[int]) -> bytes:
+    changes = None if since is None else data.changes_since(since)
+    if changes is not None:
+        return _render_event("changes", data.version, changes.to_dict())
+    # Reuse the pre-serialized rows rather than encoding them again
+    payload = b'{"version":%d,"rows":%s}' % (data.version, data.body)
+    return b"id: %d\nevent: snapshot\ndata: %s\n\n" % (data.version, payload)
+
+
+def _render_event(event: str, version: Optional[int], payload: dict) -> bytes:
+    lines = [] if version is None else [f"id: {version}"]
+    lines.append(f"event: {event}")
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    lines.append(f"data: {body}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _put_latest(queue: asyncio.Queue, item) -> None:
+    # Subscribers only need the latest item, so replace any unread one
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
@@ -29,7 +29,7 @@ def persist_user_if_not_exists(user: dict, refresh_token: str) -> None:
         "premium": False,
     }
 
-    repo = dynamodb_client.DynamoDBClient()
+    repo = dynamodb_client.default_client()
     user_item = repo.get_item(
         Config.Constants.SHEETS_API_TABLE, {"id": f"user-{email}"}
     )
@@ -50,7 +50,7 @@ def fetch_fields_for_user(email: str, fields: Iterable[str]) -> str:
         dict: Key value pairs of requested fields
     """
 
-    repo = dynamodb_client.DynamoDBClient()
+    repo = dynamodb_client.default_client()
     user_item = repo.get_item(
         Config.Constants.SHEETS_API_TABLE, {"id": f"user-{email}"}
     )
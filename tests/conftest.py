@@ -0,0 +1,26 @@
+import os
+
+# Settings without defaults; tests never reach the services they configure
+for _name in (
+    "SHEETS_API_TABLE",
+    "ANALYTICS_TABLE",
+    "GOOGLE_CLIENT_ID",
+    "GOOGLE_CLIENT_SECRET",
+    "OAUTH_SECRET_TOKEN",
+    "ENVIRONMENT",
+    "STRIPE_WEBHOOK_SECRET",
+    "STRIPE_SECRET_KEY",
+    "API_BASE_URL",
+    "CLIENT_BASE_URL",
+    "CLIENT_APP_BASE_URL",
+    "COOKIE_ALLOWED_DOMAIN",
+    "CLOUDFRONT_DISTRIBUTION_ID",
+):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("SENTRY_DSN", "")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+from sheetsapi.config import Config  # noqa: E402
+
+Config.init()
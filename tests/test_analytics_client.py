@@ -0,0 +1,107 @@
+import datetime
+
+import pytest
+
+from sheetsapi import analytics_client, rollups
+
+
+class FakeAnalyticsTable:
+    """In-memory analytics table supporting the queries `AnalyticsClient` sends."""
+
+    def __init__(self, items: list[dict]):
+        self.items = {(item["path"], item["timestamp"]): item for item in items}
+
+    def get_item(self, table: str, key: dict) -> dict | None:
+        return self.items.get((key["path"], key["timestamp"]))
+
+    def query_page(self, table, params, limit, cursor=None):
+        return self._query(params)[:limit], None
+
+    def count(self, table: str, params: dict) -> int:
+        return len(self._query(params))
+
+    def add_to_item_once(self, table, key, amounts, marker) -> bool:
+        item = self.items.setdefault((key["path"], key["timestamp"]), dict(key))
+        if marker in item:
+            return False
+        for field, amount in amounts.items():
+            item[field] = item.get(field, 0) + amount
+        item[marker] = True
+        return True
+
+    def _query(self, params: dict) -> list[dict]:
+        values = params["ExpressionAttributeValues"]
+        condition = params["KeyConditionExpression"]
+        matches = []
+        for (path, timestamp), item in sorted(self.items.items()):
+            if path != values[":path_value"]:
+                continue
+            if ">" in condition and not timestamp > values[":timestamp_value"]:
+                continue
+            if "<" in condition and not timestamp < values[":timestamp_value"]:
+                continue
+            matches.append(item)
+        return matches
+
+
+def _log(timestamp: str) -> dict:
+    return {"path": "demo", "timestamp": timestamp, "status_code": 200}
+
+
+def _total(count: int) -> dict:
+    return {
+        "path": rollups.partition_key("demo", rollups.TOTAL),
+        "timestamp": rollups.TOTAL_BUCKET,
+        rollups.TOTAL_COUNT: count,
+    }
+
+
+def _minute(bucket: str, count: int) -> dict:
+    return {
+        "path": rollups.partition_key("demo", "minute"),
+        "timestamp": bucket,
+        rollups.TOTAL_COUNT: count,
+    }
+
+
+def test_total_counts_logs_without_rollups():
+    table = FakeAnalyticsTable(
+        [_log("2024-01-01T00:00:00Z"), _log("2024-01-02T00:00:00Z")]
+    )
+    client = analytics_client.AnalyticsClient(table)
+
+    assert client.get_api_total_invocations("demo") == 2
+
+
+def test_total_backfills_logs_before_rollups_once():
+    table = FakeAnalyticsTable(
+        [
+            _log("2024-01-01T00:00:00Z"),
+            _log("2024-01-02T00:00:00Z"),
+            # Ingested after rollups were introduced, so already in the total
+            _log("2024-02-01T10:00:05Z"),
+            _minute("2024-02-01T10:00", 3),
+            _total(3),
+        ]
+    )
+    client = analytics_client.AnalyticsClient(table)
+
+    assert client.get_api_total_invocations("demo") == 5
+    assert client.get_api_total_invocations("demo") == 5
+
+    # Later invocations are only counted by the rollup
+    total = table.get_item("analytics", _total(0))
+    total[rollups.TOTAL_COUNT] += 1
+    assert client.get_api_total_invocations("demo") == 6
+
+
+def test_series_rejects_end_before_start():
+    client = analytics_client.AnalyticsClient(FakeAnalyticsTable([]))
+
+    with pytest.raises(ValueError):
+        client.get_api_invocation_series(
+            "demo",
+            "hour",
+            datetime.datetime(2024, 1, 2),
+            datetime.datetime(2024, 1, 1),
+        )
@@ -0,0 +1,52 @@
+import pytest
+
+from sheetsapi import column_index, columnar, record_query, schema
+
+VALUES = [
+    ["id", "score", "active", "name"],
+    ["1", "1.5", "TRUE", "a"],
+    ["2", "2", "false", "1"],
+    ["3", "", "true", "True"],
+    ["4", "0", "FALSE", ""],
+]
+
+
+@pytest.fixture
+def table():
+    typed, _ = schema.apply_schema(columnar.ColumnarTable.from_values(VALUES))
+    return typed
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        [("active", "1")],
+        [("active", "0")],
+        [("active", "true")],
+        [("active", "FALSE")],
+        [("active", "yes")],
+        [("active[in]", "1,false")],
+        [("id", "2.0")],
+        [("id[in]", "1,3")],
+        [("score", "2")],
+        [("score[gte]", "1")],
+        [("name", "1")],
+        [("name", "true")],
+        [("name", "")],
+    ],
+)
+def test_indexes_never_change_results(table, params):
+    query = record_query.RecordQuery.from_params(params)
+    indexes = column_index.build_indexes(list(table.headers), table)
+
+    scanned = query.select(table)
+    indexed = query.select(table, indexes)
+
+    assert indexed.positions == scanned.positions
+
+
+def test_lookup_coerces_query_values_for_bool_cells(table):
+    index = column_index.ColumnIndex.build("active", table.column("active"))
+
+    assert index.lookup("1") == [0, 2]
+    assert index.lookup("0") == [1, 3]
@@ -0,0 +1,104 @@
+import boto3
+import pytest
+import botocore.exceptions
+from botocore.stub import Stubber
+
+from sheetsapi import dynamodb_client
+
+TABLE = "analytics"
+
+
+@pytest.fixture
+def stubbed():
+    resource = boto3.resource(
+        "dynamodb",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    client = dynamodb_client.DynamoDBClient(
+        client=resource,
+        item_cache=dynamodb_client.ItemCache(frozenset(), ttl=60, max_bytes=1024),
+    )
+    with Stubber(resource.meta.client) as stubber:
+        yield client, stubber
+
+
+def _transaction(marker_path: str) -> dict:
+    return {
+        "TransactItems": [
+            {
+                "Put": {
+                    "TableName": TABLE,
+                    "Item": {"path": {"S": marker_path}, "timestamp": {"S": "demo"}},
+                    "ConditionExpression": "attribute_not_exists(#key)",
+                    "ExpressionAttributeNames": {"#key": "path"},
+                }
+            },
+            {
+                "Update": {
+                    "TableName": TABLE,
+                    "Key": {"path": {"S": "demo#total"}, "timestamp": {"S": "all"}},
+                    "UpdateExpression": "ADD #f0 :f0",
+                    "ExpressionAttributeNames": {"#f0": "total"},
+                    "ExpressionAttributeValues": {":f0": {"N": "3"}},
+                }
+            },
+        ]
+    }
+
+
+def test_add_to_items_once_skips_additions_already_applied(stubbed):
+    client, stubber = stubbed
+    stubber.add_response("transact_write_items", {}, _transaction("#ingested#a"))
+    stubber.add_client_error(
+        "transact_write_items",
+        service_error_code="TransactionCanceledException",
+        expected_params=_transaction("#ingested#b"),
+        modeled_fields={
+            "CancellationReasons": [
+                {"Code": "ConditionalCheckFailed"},
+                {"Code": "None"},
+            ]
+        },
+    )
+
+    def add(marker_path):
+        return client.add_to_items_once(
+            TABLE,
+            [
+                (
+                    {"path": "demo#total", "timestamp": "all"},
+                    {"total": 3},
+                    {"path": marker_path, "timestamp": "demo"},
+                )
+            ],
+        )
+
+    assert add("#ingested#a") == 1
+    assert add("#ingested#b") == 0
+    stubber.assert_no_pending_responses()
+
+
+def test_add_to_items_once_raises_other_cancellations(stubbed):
+    client, stubber = stubbed
+    stubber.add_client_error(
+        "transact_write_items",
+        service_error_code="TransactionCanceledException",
+        expected_params=_transaction("#ingested#a"),
+        modeled_fields={
+            "CancellationReasons": [{"Code": "None"}, {"Code": "ThrottlingError"}]
+        },
+    )
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        client.add_to_items_once(
+            TABLE,
+            [
+                (
+                    {"path": "demo#total", "timestamp": "all"},
+                    {"total": 3},
+                    {"path": "#ingested#a", "timestamp": "demo"},
+                )
+            ],
+        )
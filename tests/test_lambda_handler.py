@@ -0,0 +1,80 @@
+import base64
+import io
+
+import pyarrow.ipc
+import pytest
+
+import api
+from sheetsapi import google_sheets
+from tests.test_sheets_values_client import (
+    SPREADSHEET_ID,
+    FakeGoogle,
+    FakeRepository,
+    _values_client,
+)
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    item = {
+        "id": "sheet-demo",
+        "sheet_id": SPREADSHEET_ID,
+        "cdn_ttl": 15,
+        "auth_creds": {
+            "access_token": "token",
+            "refresh_token": "refresh",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "client_id": "client",
+            "client_secret": "secret",
+        },
+    }
+    handler = google_sheets.GoogleSheets(
+        repository=FakeRepository({"sheet-demo": item}),
+        shared_worksheet_cache=None,
+        values_client=_values_client(FakeGoogle()),
+    )
+    monkeypatch.setattr(api, "sheets_handler", handler)
+    return handler
+
+
+def _invoke(path: str, params: dict, headers: dict) -> dict:
+    """Call the Lambda handler with an API Gateway REST proxy event."""
+    event = {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": headers,
+        "multiValueHeaders": {k: [v] for k, v in headers.items()},
+        "queryStringParameters": params,
+        "multiValueQueryStringParameters": {k: [v] for k, v in params.items()},
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": "/{proxy+}",
+            "httpMethod": "GET",
+            "path": f"/test{path}",
+            "stage": "test",
+            "identity": {"sourceIp": "127.0.0.1"},
+        },
+        "body": None,
+        "isBase64Encoded": False,
+    }
+    return api.handler(event, None)
+
+
+def test_arrow_export_is_returned_as_binary(sheets):
+    response = _invoke("/api/demo", {"format": "arrow"}, {"host": "example.com"})
+
+    # API Gateway decodes base64 bodies for binary media types, see lambda.yaml
+    assert response["statusCode"] == 200
+    assert response["isBase64Encoded"]
+    body = base64.b64decode(response["body"])
+    table = pyarrow.ipc.open_stream(io.BytesIO(body)).read_all()
+    assert table.to_pylist() == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+
+
+def test_pooled_clients_outlive_invocations(sheets):
+    _invoke("/api/demo", {}, {"host": "example.com"})
+    _invoke("/api/demo", {}, {"host": "example.com"})
+
+    assert sheets.values_client._http is not None
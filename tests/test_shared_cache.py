@@ -0,0 +1,160 @@
+import pickle
+import time
+
+import pytest
+
+from sheetsapi import (
+    column_index,
+    columnar,
+    disk_cache,
+    google_sheets,
+    row_diff,
+    shared_cache,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class Exploit:
+    """Pickles to a call that records it was run."""
+
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (Exploit, "ran", True))
+
+
+@pytest.fixture
+def redis_cache():
+    return shared_cache.RedisCache(client=fakeredis.FakeRedis())
+
+
+@pytest.fixture
+def file_cache(tmp_path):
+    return disk_cache.DiskCache(directory=str(tmp_path), max_bytes=1024 * 1024)
+
+
+@pytest.fixture(params=["redis", "disk"])
+def cache(request, redis_cache, file_cache):
+    return redis_cache if request.param == "redis" else file_cache
+
+
+def test_put_get_round_trips_metadata_and_payload(cache):
+    cache.put("key", {"a": [1, "b"]}, b"payload", ttl=60, fresh_until=123.0)
+
+    entry = cache.get("key")
+
+    assert entry.metadata == {"a": [1, "b"]}
+    assert bytes(entry.payload) == b"payload"
+    assert entry.fresh_until == 123.0
+    assert 0 < entry.ttl() <= 60
+
+
+def test_peek_reads_header_only(cache):
+    fresh_until = time.time() + 30
+    cache.put("key", {}, b"x" * 10_000, ttl=60, fresh_until=fresh_until)
+
+    header = cache.peek("key")
+
+    assert header.fresh_until == fresh_until
+    assert header.is_fresh()
+    assert cache.peek("missing") is None
+    assert cache.snapshot_stats()["hits"] == 0
+
+
+def test_expired_entry_is_a_miss(cache, monkeypatch):
+    cache.put("key", {}, b"payload", ttl=60)
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() + 120)
+
+    assert cache.get("key") is None
+    assert cache.peek("key") is None
+
+
+def test_pickled_metadata_is_never_loaded(redis_cache):
+    pickled = pickle.dumps(Exploit())
+    header = shared_cache._HEADER.pack(
+        shared_cache._MAGIC, time.time() + 60, 0.0, len(pickled)
+    )
+    redis_cache.client.set("sheets-api:key", header + pickled + b"payload")
+
+    assert redis_cache.get("key") is None
+    assert not Exploit.ran
+
+
+def test_old_format_entry_is_a_miss(redis_cache):
+    pickled = pickle.dumps({})
+    old_header = shared_cache.struct.pack(
+        "<5sdQ", b"SAPI1", time.time() + 60, len(pickled)
+    )
+    redis_cache.client.set("sheets-api:key", old_header + pickled)
+
+    assert redis_cache.get("key") is None
+    assert redis_cache.peek("key") is None
+
+
+def test_redis_lock_is_exclusive_until_released(redis_cache):
+    token = redis_cache.try_lock("key", ttl=30)
+
+    assert token is not None
+    assert redis_cache.try_lock("key", ttl=30) is None
+    redis_cache.unlock("key", "someone else's token")
+    assert redis_cache.try_lock("key", ttl=30) is None
+    redis_cache.unlock("key", token)
+    assert redis_cache.try_lock("key", ttl=30) is not None
+
+
+def test_sheet_data_snapshot_round_trips(redis_cache):
+    table = columnar.ColumnarTable.from_values(
+        [["id", "price", "name"], ["1", "1.5", "a"], ["2", "2", "b"]]
+    )
+    changes = row_diff.RowChanges(
+        since=1, version=2, key_column="id", added={2: table.row(1)}, removed=[3]
+    )
+    sheet_data = google_sheets.SheetData.build(
+        "Sheet1",
+        table,
+        indexes=column_index.build_indexes(["id"], table),
+        changes=[changes],
+        modified_time="2024-01-01T00:00:00.000Z",
+    )
+
+    redis_cache.put("key", *sheet_data.to_snapshot(), ttl=60)
+    entry = redis_cache.get("key")
+    loaded = google_sheets.SheetData.from_snapshot(entry.metadata, entry.payload)
+
+    assert loaded.table.columns == table.columns
+    assert loaded.table.column("id").typecode == "q"
+    assert bytes(loaded.body) == sheet_data.body
+    assert loaded.etag == sheet_data.etag
+    assert loaded.changes == [changes]
+    assert loaded.modified_time == sheet_data.modified_time
+    assert loaded.get_row("2", column="id") == {"id": 2, "price": 2.0, "name": "b"}
+
+
+def test_sheet_data_size_counts_heap_backed_bodies(redis_cache, file_cache):
+    table = columnar.ColumnarTable.from_values(
+        [["id", "name"]] + [[str(i), "x" * 100] for i in range(1000)]
+    )
+    sheet_data = google_sheets.SheetData.build("Sheet1", table)
+
+    def load(cache):
+        cache.put("key", *sheet_data.to_snapshot(), ttl=60)
+        entry = cache.get("key")
+        return google_sheets.SheetData.from_snapshot(entry.metadata, entry.payload)
+
+    from_redis = load(redis_cache)
+    from_disk = load(file_cache)
+
+    assert from_redis.nbytes() >= sheet_data.nbytes()
+    assert from_disk.nbytes() < sheet_data.nbytes() - len(sheet_data.body) // 2
+
+
+def test_disk_locks_are_exclusive_and_leave_no_files(file_cache, tmp_path):
+    token = file_cache.try_lock("key", ttl=30)
+
+    assert token is not None
+    assert file_cache.try_lock("key", ttl=30) is None
+    file_cache.unlock("key", token)
+    assert list(tmp_path.iterdir()) == []
+    file_cache.unlock("key", file_cache.try_lock("key", ttl=30))
@@ -0,0 +1,198 @@
+import asyncio
+import copy
+import time
+
+import httpx
+import pytest
+from google.oauth2.credentials import Credentials
+
+from sheetsapi import google_sheets, sheets_values_client
+
+SPREADSHEET_ID = "spreadsheet"
+MODIFIED_TIME = "2024-01-01T00:00:00.000Z"
+
+
+class FakeGoogle:
+    """Fake Sheets values and Drive files endpoints."""
+
+    def __init__(self, drive_status: int = 200):
+        self.drive_status = drive_status
+        self.values = [["id", "name"], ["1", "a"], ["2", "b"]]
+        self.requests: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        if request.url.path.startswith("/drive/v3/files/"):
+            if self.drive_status != 200:
+                return httpx.Response(self.drive_status, json={"error": {}})
+            return httpx.Response(200, json={"modifiedTime": MODIFIED_TIME})
+        if "/values/" in request.url.path:
+            return httpx.Response(200, json={"values": self.values})
+        return httpx.Response(404)
+
+    def count(self, kind: str) -> int:
+        prefix = "/drive/" if kind == "drive" else "/v4/"
+        return sum(path.startswith(prefix) for path in self.requests)
+
+
+class FakeRepository:
+    """Just enough of `DynamoDBClient` to serve API items."""
+
+    def __init__(self, items: dict):
+        self.items = items
+        self.item_cache = _NoItemCache()
+
+    def get_item(self, table: str, key: dict) -> dict | None:
+        return copy.deepcopy(self.items.get(key["id"]))
+
+
+class _NoItemCache:
+    def get(self, table: str, key: dict) -> None:
+        return None
+
+
+def _values_client(google: FakeGoogle) -> sheets_values_client.AsyncSheetsValuesClient:
+    client = sheets_values_client.AsyncSheetsValuesClient()
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(google.handle))
+    return client
+
+
+def _credentials(refresh_token: str = "refresh") -> Credentials:
+    return Credentials(
+        token="token",
+        refresh_token=refresh_token,
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id="client",
+        client_secret="secret",
+    )
+
+
+def test_get_modified_time():
+    google = FakeGoogle()
+    client = _values_client(google)
+
+    modified_time = asyncio.run(
+        client.get_modified_time(_credentials(), SPREADSHEET_ID)
+    )
+
+    assert modified_time == MODIFIED_TIME
+
+
+def test_drive_403_is_remembered_per_credential():
+    google = FakeGoogle(drive_status=403)
+    client = _values_client(google)
+
+    async def check(refresh_token):
+        return await client.get_modified_time(
+            _credentials(refresh_token), SPREADSHEET_ID
+        )
+
+    assert asyncio.run(check("refresh")) is None
+    assert asyncio.run(check("refresh")) is None
+    assert google.count("drive") == 1
+
+    # Other grants may include the scope, so they are still checked
+    assert asyncio.run(check("other")) is None
+    assert google.count("drive") == 2
+
+
+def test_drive_403_is_forgotten_after_ttl():
+    google = FakeGoogle(drive_status=403)
+    client = _values_client(google)
+    client.drive_denied_ttl = 0.01
+
+    asyncio.run(client.get_modified_time(_credentials(), SPREADSHEET_ID))
+    time.sleep(0.02)
+    asyncio.run(client.get_modified_time(_credentials(), SPREADSHEET_ID))
+
+    assert google.count("drive") == 2
+
+
+@pytest.fixture
+def sheets():
+    def make(google: FakeGoogle) -> google_sheets.GoogleSheets:
+        item = {
+            "id": "sheet-demo",
+            "sheet_id": SPREADSHEET_ID,
+            "cdn_ttl": 0,
+            "auth_creds": {
+                "access_token": "token",
+                "refresh_token": "refresh",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "client_id": "client",
+                "client_secret": "secret",
+            },
+        }
+        return google_sheets.GoogleSheets(
+            repository=FakeRepository({"sheet-demo": item}),
+            shared_worksheet_cache=None,
+            values_client=_values_client(google),
+        )
+
+    return make
+
+
+def test_stale_worksheet_is_revalidated_by_modified_time(sheets):
+    google = FakeGoogle()
+    handler = sheets(google)
+
+    async def read(times):
+        return [await handler.refresh_sheet_data_async("demo") for _ in range(times)]
+
+    # The first refresh of stale data learns the modification time
+    _, refetched, revalidated = asyncio.run(read(3))
+
+    assert revalidated.version == refetched.version
+    assert revalidated.fetched_at > refetched.fetched_at
+    assert google.count("values") == 2
+    assert google.count("drive") == 2
+
+
+def test_stale_worksheet_is_refetched_after_drive_403(sheets):
+    google = FakeGoogle(drive_status=403)
+    handler = sheets(google)
+
+    async def read(times):
+        for _ in range(times):
+            data = await handler.refresh_sheet_data_async("demo")
+        return data
+
+    data = asyncio.run(read(3))
+
+    assert data.records() == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    assert google.count("values") == 3
+    # Only the first stale refresh asked Drive
+    assert google.count("drive") == 1
+
+
+def test_versions_are_shared_by_every_process(sheets):
+    google = FakeGoogle()
+    handler, other = sheets(google), sheets(google)
+
+    async def read():
+        old = await handler.refresh_sheet_data_async("demo")
+        google.values = [["id", "name"], ["1", "a"], ["2", "c"]]
+        new = await handler.refresh_sheet_data_async("demo")
+        return old, new, await other.refresh_sheet_data_async("demo")
+
+    old, new, elsewhere = asyncio.run(read())
+
+    assert new.version != old.version
+    assert elsewhere.version == new.version
+    # Rows are identified by row number, without index columns
+    assert new.changes_since(old.version).changed == {3: {"id": 2, "name": "c"}}
+
+
+def test_deleted_api_is_evicted_by_background_refresh(sheets):
+    handler = sheets(FakeGoogle())
+
+    async def read():
+        await handler.get_sheet_data_async("demo")
+        handler.repository.items.clear()
+        # Stale data is served while the refresh finds the API deleted
+        await handler.get_sheet_data_async("demo")
+        await asyncio.gather(*handler._background_tasks)
+
+    asyncio.run(read())
+
+    assert handler.hot_worksheet_cache.get("demo-Sheet1") is None